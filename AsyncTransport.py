@@ -0,0 +1,108 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Optional
+
+import httpx
+
+from RateLimiter import RateLimiter, rate_limiter, backoff_delay, retry_after
+from Telemetry import telemetry
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 in httpx)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64)',
+    'Accept-Language': 'en-US,en;q=0.9',
+}
+TRANSPORT_TIMEOUT = 30
+TRANSPORT_MAX_CONNECTIONS = 32
+TRANSPORT_RETRIES = 2
+TRANSPORT_BACKOFF = 1.0  # Base delay for exponential backoff (seconds)
+
+
+def is_transient(status: Optional[int]) -> bool:
+    """Connection errors (no status), 5xx and 429 are worth retrying"""
+    return status is None or status >= 500 or status == 429
+
+
+class AsyncTransport:
+    """
+    One pooled httpx.AsyncClient shared by every client: keep-alive connections,
+    HTTP/2 when the h2 package is installed, the process-wide per-host rate,
+    concurrency and circuit-breaker limits (RateLimiter) and a single
+    timeout/retry policy.
+    """
+    def __init__(self, timeout: float = TRANSPORT_TIMEOUT, max_connections: int = TRANSPORT_MAX_CONNECTIONS,
+                 retries: int = TRANSPORT_RETRIES, backoff: float = TRANSPORT_BACKOFF,
+                 limiter: Optional[RateLimiter] = None):
+        self.client = httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=httpx.Timeout(timeout),
+            headers=DEFAULT_HEADERS,
+            follow_redirects=True,
+        )
+        self.retries = retries
+        self.backoff = backoff
+        self.limiter = limiter or rate_limiter
+
+    async def __aenter__(self) -> 'AsyncTransport':
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+    def backoff_delay(self, attempt: int) -> float:
+        return backoff_delay(attempt, self.backoff)
+
+    async def request(self, method: str, url: str, retries: Optional[int] = None, scoped_429: bool = False,
+                      **kwargs) -> httpx.Response:
+        """
+        Send a request, retrying transient failures. The last response is
+        returned as-is (callers check the status); the last connection error
+        is raised, and CircuitOpen when the host's circuit is open. See
+        HostLimiter.record for scoped_429.
+        """
+        retries = self.retries if retries is None else retries
+        host = self.limiter.host(url)
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                async with host.slot():
+                    try:
+                        response = await self.client.request(method, url, **kwargs)
+                    except httpx.TransportError:
+                        host.record(None)
+                        raise
+                    host.record(response.status_code, retry_after(response.headers), scoped_429)
+            except httpx.TransportError as e:
+                if attempt > retries:
+                    raise
+                logging.warning(f"{method} {url} failed (attempt {attempt}): {str(e)}")
+            else:
+                if not is_transient(response.status_code) or attempt > retries:
+                    return response
+                logging.warning(f"{method} {url} returned {response.status_code} (attempt {attempt})")
+            telemetry.count('retries')
+            await asyncio.sleep(self.backoff_delay(attempt))
+
+    @asynccontextmanager
+    async def stream(self, method: str, url: str, **kwargs):
+        """Streamed response under the per-host limits (not retried: the body is consumed incrementally)"""
+        host = self.limiter.host(url)
+        async with host.slot():
+            try:
+                async with self.client.stream(method, url, **kwargs) as response:
+                    host.record(response.status_code, retry_after(response.headers))
+                    yield response
+            except httpx.TransportError:
+                host.record(None)
+                raise
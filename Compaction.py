@@ -0,0 +1,98 @@
+import math
+import re
+from typing import Dict, Any, Optional, List, Set
+
+AI_INPUT_TOKEN_BUDGET = 900  # Source tokens sent to the model per post
+MIN_SENTENCE_LENGTH = 20
+
+# Boilerplate that carries no facts for a post
+LOW_VALUE_PATTERNS = [
+    r'ערך מורחב',
+    r'ראו גם',
+    r'לקריאה נוספת',
+    r'קישורים חיצוניים',
+    r'הערות שוליים',
+    r'ערך זה',
+    r'לערך המלא',
+    r'\bcoordinates\b',
+    r'\d+°\s*\d+′',
+]
+HEBREW_PREFIXES = 'ובהלמשכ'
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Local token estimate for GPT-style BPE tokenizers: Latin text runs about four
+    characters per token, Hebrew about two and a half.
+    """
+    latin = sum(1 for c in text if c.isascii() and not c.isspace())
+    other = sum(1 for c in text if not c.isascii() and not c.isspace())
+    return math.ceil(latin / 4 + other / 2.5)
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split on sentence-ending punctuation followed by whitespace"""
+    return [s.strip() for s in re.split(r'(?<=[.!?])\s+', text) if s.strip()]
+
+
+def _terms(text: str) -> Set[str]:
+    """Content words, also indexed without a leading Hebrew prefix letter"""
+    terms = set()
+    for word in re.findall(r'[\w"\']+', text):
+        word = word.strip('"\'')
+        if len(word) < 2:
+            continue
+        terms.add(word)
+        if len(word) > 3 and word[0] in HEBREW_PREFIXES:
+            terms.add(word[1:])
+    return terms
+
+
+def _is_low_value(sentence: str) -> bool:
+    return len(sentence) < MIN_SENTENCE_LENGTH or any(re.search(p, sentence) for p in LOW_VALUE_PATTERNS)
+
+
+def compact_source(text: str, event: Optional[Dict[str, Any]] = None,
+                   budget: int = AI_INPUT_TOKEN_BUDGET) -> str:
+    """
+    Pack the most relevant sentences of an article into a token budget.
+
+    Sentences are ranked by overlap with the event text and subject, with a
+    bonus for dates and for appearing early in the article; boilerplate is
+    dropped. The opening sentence is always kept, and the chosen sentences are
+    returned in their original order.
+    """
+    if estimate_tokens(text) <= budget:
+        return text
+
+    sentences = split_sentences(text)
+    query = _terms(' '.join(filter(None, [
+        (event or {}).get('event', ''), (event or {}).get('subject', '')
+    ])))
+
+    scored = []
+    for i, sentence in enumerate(sentences):
+        if i > 0 and _is_low_value(sentence):
+            continue
+        terms = _terms(sentence)
+        overlap = len(terms & query) / math.sqrt(len(terms) or 1)
+        score = overlap + 1.0 / (1 + i * 0.2)
+        if re.search(r'\b\d{3,4}\b', sentence):
+            score += 0.3  # Years and other concrete figures
+        if i == 0:
+            score = float('inf')  # The lead sentence defines the subject
+        scored.append((score, i, sentence))
+
+    chosen = []
+    used = 0
+    for score, i, sentence in sorted(scored, key=lambda s: (-s[0], s[1])):
+        cost = estimate_tokens(sentence)
+        if used + cost > budget:
+            continue
+        chosen.append((i, sentence))
+        used += cost
+
+    if not chosen:
+        # A single over-long opening sentence: cut it to the budget
+        return text[:int(budget * 2.5)]
+    return ' '.join(sentence for _, sentence in sorted(chosen))
@@ -0,0 +1,210 @@
+"""
+Optional SQLite backend for the event archive: indexed by Hebrew (month,
+day), Gregorian year and subject, with an FTS5 trigram index over the event
+text and subject (substring matches, so Hebrew words are found with their
+prefixes: חסיד matches החסידות).
+
+    python EventDatabase.py build
+    python EventDatabase.py search חסיד --month כסלו
+    python EventDatabase.py search --century 18 --limit 20
+"""
+import argparse
+import json
+import os
+import sqlite3
+from typing import Dict, Any, Optional, List
+
+from EventStore import HEBREW_EVENTS_FILE, event_id, load_source, source_hash
+from HebrewCalendar import DAY_ORDINALS, MONTH_ORDER
+
+EVENT_DB_FILE = "hebrew_events.db"
+
+SCHEMA = """
+CREATE TABLE events (
+    rowid INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    month TEXT NOT NULL,
+    day TEXT NOT NULL,
+    month_order INTEGER,
+    day_ordinal INTEGER,
+    year TEXT,
+    gregorian_year INTEGER,
+    subject TEXT,
+    subject_url TEXT,
+    event TEXT NOT NULL,
+    data TEXT NOT NULL  -- The archive entry as JSON, including any metadata
+);
+CREATE INDEX events_date ON events (month, day);
+CREATE INDEX events_gregorian_year ON events (gregorian_year);
+CREATE INDEX events_subject ON events (subject);
+CREATE VIRTUAL TABLE events_fts USING fts5 (
+    event, subject, content='events', content_rowid='rowid', tokenize='trigram'
+);
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+def build_event_database(events: List[Dict[str, Any]], filename: str = EVENT_DB_FILE,
+                         source_digest: Optional[str] = None) -> int:
+    """Write events to a fresh database file (replaced atomically); returns the number of rows"""
+    tmp = f"{filename}.tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    conn = sqlite3.connect(tmp)
+    try:
+        conn.executescript(SCHEMA)
+        conn.executemany(
+            "INSERT OR REPLACE INTO events (id, month, day, month_order, day_ordinal, year, gregorian_year,"
+            " subject, subject_url, event, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (event_id(e), e['month'], e['day'], MONTH_ORDER.get(e['month']), DAY_ORDINALS.get(e['day']),
+                 e.get('year'), e.get('gregorian_year'), e.get('subject'), e.get('subject_url'), e['event'],
+                 json.dumps(e, ensure_ascii=False))
+                for e in events
+            ],
+        )
+        conn.execute("INSERT INTO events_fts (events_fts) VALUES ('rebuild')")
+        conn.executemany("INSERT INTO meta VALUES (?, ?)", [
+            ('count', str(len(events))),
+            ('source_hash', source_digest or ''),
+        ])
+        conn.commit()
+        count = conn.execute("SELECT count(*) FROM events").fetchone()[0]
+    finally:
+        conn.close()
+    os.replace(tmp, filename)
+    return count
+
+
+def compile_event_database(source: str = HEBREW_EVENTS_FILE, filename: str = EVENT_DB_FILE) -> int:
+    """Rebuild the database from the JSON archive."""
+    events, digest = load_source(source)
+    return build_event_database(events, filename, source_digest=digest)
+
+
+class EventDatabase:
+    """
+    Read-only view over the SQLite archive with the same candidates() /
+    random_event() interface as EventStore, plus search(). Rows are decoded
+    only when returned.
+    """
+    def __init__(self, filename: str = EVENT_DB_FILE):
+        if not os.path.exists(filename):
+            raise FileNotFoundError(filename)
+        self.filename = filename
+        self.conn = sqlite3.connect(f"file:{filename}?mode=ro", uri=True, check_same_thread=False)
+        try:
+            meta = dict(self.conn.execute("SELECT key, value FROM meta"))
+        except sqlite3.DatabaseError as e:
+            self.conn.close()
+            raise ValueError(f"{filename} is not an event database: {e}")
+        self.count = int(meta.get('count', 0))
+        self.source_hash = meta.get('source_hash') or None
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _rows(self, sql: str, params=()) -> List[Dict[str, Any]]:
+        return [json.loads(data) for (data,) in self.conn.execute(sql, params)]
+
+    def candidates(self, day: str, month: str) -> List[Dict[str, Any]]:
+        """Events for a Hebrew (day, month)."""
+        return self._rows("SELECT data FROM events WHERE month = ? AND day = ? ORDER BY rowid", (month, day))
+
+    def random_event(self) -> Optional[Dict[str, Any]]:
+        """Uniformly random event."""
+        rows = self._rows("SELECT data FROM events LIMIT 1 OFFSET abs(random()) % max(?, 1)", (self.count,))
+        return rows[0] if rows else None
+
+    def search(self, text: Optional[str] = None, month: Optional[str] = None, day: Optional[str] = None,
+               year_from: Optional[int] = None, year_to: Optional[int] = None, subject: Optional[str] = None,
+               limit: int = 50) -> List[Dict[str, Any]]:
+        """
+        Events matching every given filter: `text` is a full-text query over
+        event and subject (words of three letters or more, all required),
+        years are inclusive Gregorian bounds. Text matches come best first,
+        everything else in calendar order.
+        """
+        sql = "SELECT e.data FROM events e"
+        order = "e.month_order, e.day_ordinal, e.gregorian_year"
+        where, params = [], []
+        if text:
+            words = [w for w in text.split() if len(w) >= 3]
+            if not words:
+                raise ValueError("Search words need at least three letters")
+            sql = "SELECT e.data FROM events_fts f JOIN events e ON e.rowid = f.rowid"
+            order = "f.rank"
+            where.append("events_fts MATCH ?")
+            params.append(' AND '.join('"' + w.replace('"', '""') + '"' for w in words))
+        for column, value in (('month', month), ('day', day), ('subject', subject)):
+            if value is not None:
+                where.append(f"e.{column} = ?")
+                params.append(value)
+        if year_from is not None:
+            where.append("e.gregorian_year >= ?")
+            params.append(year_from)
+        if year_to is not None:
+            where.append("e.gregorian_year <= ?")
+            params.append(year_to)
+
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += f" ORDER BY {order} LIMIT ?"
+        return self._rows(sql, params + [limit])
+
+    def is_stale(self, source: str = HEBREW_EVENTS_FILE) -> bool:
+        """Cheap staleness check against the JSON archive (hash of its bytes)."""
+        try:
+            return self.source_hash is not None and source_hash(source) != self.source_hash
+        except OSError:
+            return False
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('build', help="compile hebrew_events.json into the database")
+    build.add_argument('source', nargs='?', default=HEBREW_EVENTS_FILE)
+    build.add_argument('target', nargs='?', default=EVENT_DB_FILE)
+    search = commands.add_parser('search', help="query the database")
+    search.add_argument('text', nargs='?', help="words in the event text or subject")
+    search.add_argument('--month')
+    search.add_argument('--day')
+    search.add_argument('--subject')
+    search.add_argument('--from-year', type=int)
+    search.add_argument('--to-year', type=int)
+    search.add_argument('--century', type=int, help="Gregorian century, e.g. 18 for 1700-1799")
+    search.add_argument('--limit', type=int, default=50)
+    search.add_argument('--json', action='store_true', help="print full entries as JSON")
+    search.add_argument('--db', default=EVENT_DB_FILE)
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        rows = compile_event_database(args.source, args.target)
+        print(f"Compiled {args.source} into {args.target} ({rows} events)")
+        return
+
+    year_from, year_to = args.from_year, args.to_year
+    if args.century is not None:
+        year_from, year_to = (args.century - 1) * 100, args.century * 100 - 1
+    db = EventDatabase(args.db)
+    try:
+        results = db.search(args.text, args.month, args.day, year_from, year_to, args.subject, args.limit)
+    except ValueError as e:
+        db.close()
+        search.error(str(e))
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=4))
+    else:
+        for e in results:
+            print(f"{e['day']} {e['month']} {e.get('year', '')} ({e.get('gregorian_year', '')}): "
+                  f"{e.get('subject', '')} – {e['event']}")
+        print(f"{len(results)} events")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+import hashlib
+import json
+import mmap
+import os
+import random
+import sys
+from typing import Dict, Any, Optional, List, Tuple
+
+STORE_MAGIC = b"KEDMA-EVENTS 1\n"
+HEBREW_EVENTS_FILE = "hebrew_events.json"
+EVENT_STORE_FILE = "hebrew_events.idx"
+BAD_STATUSES = {'missing', 'invalid', 'short'}  # Validation results that make an event unusable
+
+
+def store_key(day: str, month: str) -> str:
+    """Index key for a Hebrew (month, day) bucket."""
+    return f"{month}|{day}"
+
+
+def event_id(event: Dict[str, Any]) -> str:
+    """
+    Stable identifier of an archive event: its stored id, else a hash of the
+    fields that identify it (date, year and subject link), so that rewording
+    the event text keeps the id.
+    """
+    if event.get('id'):
+        return event['id']
+    identity = '|'.join([event['month'], event['day'], event.get('year', ''), event.get('subject_url', '')])
+    return hashlib.sha1(identity.encode('utf-8')).hexdigest()[:12]
+
+
+def source_hash(source: str = HEBREW_EVENTS_FILE) -> str:
+    """
+    Digest of the JSON archive's bytes. The compiled store and the SQLite
+    database record it, so any edit, even one that keeps the file size, makes
+    them stale.
+    """
+    with open(source, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def load_source(source: str = HEBREW_EVENTS_FILE) -> Tuple[List[Dict[str, Any]], str]:
+    """Events of the JSON archive and the source_hash of the bytes they were read from."""
+    with open(source, 'rb') as f:
+        raw = f.read()
+    return json.loads(raw), hashlib.sha256(raw).hexdigest()
+
+
+def is_usable(event: Dict[str, Any]) -> bool:
+    """
+    False when the last validation (see Validation.py) found a dead link or
+    too little article text. Unvalidated events, and those whose check hit a
+    network error, count as usable.
+    """
+    return (event.get('validation') or {}).get('status') not in BAD_STATUSES
+
+
+def build_event_store(events: List[Dict[str, Any]], filename: str = EVENT_STORE_FILE,
+                      source_digest: Optional[str] = None) -> int:
+    """
+    Compile events into a store file: a magic line, a one-line JSON header holding
+    the (month, day) index, then one compact JSON array per bucket. Returns the
+    number of buckets written.
+    """
+    buckets: Dict[str, List[Dict[str, Any]]] = {}
+    for event in events:
+        buckets.setdefault(store_key(event['day'], event['month']), []).append(event)
+
+    body = bytearray()
+    index = {}
+    for key, bucket in buckets.items():
+        blob = json.dumps(bucket, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        index[key] = [len(body), len(blob), len(bucket)]
+        body += blob
+
+    header = {
+        'count': len(events),
+        'source_hash': source_digest,
+        'index': index,
+    }
+    tmp = f"{filename}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(STORE_MAGIC)
+        f.write(json.dumps(header, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+        f.write(b"\n")
+        f.write(body)
+    os.replace(tmp, filename)
+    return len(index)
+
+
+def compile_events_file(source: str = HEBREW_EVENTS_FILE, filename: str = EVENT_STORE_FILE) -> int:
+    """Rebuild the compiled store from the JSON archive."""
+    events, digest = load_source(source)
+    return build_event_store(events, filename, source_digest=digest)
+
+
+class EventStore:
+    """
+    Read-only, memory-mapped view over a compiled event store. Only the small
+    header is decoded on open; a day's bucket is decoded on lookup.
+    """
+    def __init__(self, filename: str = EVENT_STORE_FILE):
+        self.filename = filename
+        self._file = open(filename, 'rb')
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            if self._mm.readline() != STORE_MAGIC:
+                raise ValueError(f"{filename} is not a compiled event store")
+            header = json.loads(self._mm.readline())
+        except Exception:
+            self.close()
+            raise
+        self._base = self._mm.tell()
+        self.index: Dict[str, List[int]] = header['index']
+        self.count: int = header['count']
+        self.source_hash: Optional[str] = header.get('source_hash')
+
+    def __len__(self) -> int:
+        return self.count
+
+    def candidates(self, day: str, month: str) -> List[Dict[str, Any]]:
+        """Events for a Hebrew (day, month), decoding only that bucket."""
+        entry = self.index.get(store_key(day, month))
+        if not entry:
+            return []
+        offset, length, _ = entry
+        start = self._base + offset
+        return json.loads(self._mm[start:start + length])
+
+    def random_event(self) -> Optional[Dict[str, Any]]:
+        """Uniformly random event, decoding a single bucket."""
+        if not self.index:
+            return None
+        keys = list(self.index)
+        key = random.choices(keys, weights=[self.index[k][2] for k in keys])[0]
+        month, day = key.split('|', 1)
+        return random.choice(self.candidates(day, month))
+
+    def is_stale(self, source: str = HEBREW_EVENTS_FILE) -> bool:
+        """Cheap staleness check against the JSON archive (hash of its bytes, no decode)."""
+        try:
+            return self.source_hash is not None and source_hash(source) != self.source_hash
+        except OSError:
+            return False
+
+    def close(self) -> None:
+        mm = getattr(self, '_mm', None)
+        if mm is not None:
+            mm.close()
+        self._file.close()
+
+
+class EventIndex:
+    """
+    In-memory (month, day) index over the JSON archive for long-running
+    processes. reload() re-reads the file only when its mtime or size
+    changed, and replaces only the buckets whose events differ.
+    """
+    def __init__(self, source: str = HEBREW_EVENTS_FILE):
+        self.source = source
+        self.buckets: Dict[str, List[Dict[str, Any]]] = {}
+        self.count = 0
+        self._signature: Optional[tuple] = None
+        self.reload()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def reload(self) -> Optional[Dict[str, int]]:
+        """
+        Pick up changes to the archive. Returns counts of added, changed and
+        removed dates, or None if the file is unchanged or unreadable (a file
+        caught mid-write is retried on the next call).
+        """
+        try:
+            stat = os.stat(self.source)
+            signature = (stat.st_mtime_ns, stat.st_size)
+            if signature == self._signature:
+                return None
+            with open(self.source, 'r', encoding='utf-8') as f:
+                events = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        buckets: Dict[str, List[Dict[str, Any]]] = {}
+        for event in events:
+            buckets.setdefault(store_key(event['day'], event['month']), []).append(event)
+
+        changes = {'added': 0, 'changed': 0, 'removed': 0}
+        for key in list(self.buckets):
+            if key not in buckets:
+                del self.buckets[key]
+                changes['removed'] += 1
+        for key, bucket in buckets.items():
+            if key not in self.buckets:
+                changes['added'] += 1
+            elif self.buckets[key] != bucket:
+                changes['changed'] += 1
+            else:
+                continue
+            self.buckets[key] = bucket
+        self.count = len(events)
+        self._signature = signature
+        return changes
+
+    def candidates(self, day: str, month: str) -> List[Dict[str, Any]]:
+        """Events for a Hebrew (day, month)."""
+        return list(self.buckets.get(store_key(day, month), []))
+
+    def random_event(self) -> Optional[Dict[str, Any]]:
+        """Uniformly random event."""
+        if not self.buckets:
+            return None
+        keys = list(self.buckets)
+        key = random.choices(keys, weights=[len(self.buckets[k]) for k in keys])[0]
+        return random.choice(self.buckets[key])
+
+
+if __name__ == "__main__":
+    source = sys.argv[1] if len(sys.argv) > 1 else HEBREW_EVENTS_FILE
+    target = sys.argv[2] if len(sys.argv) > 2 else EVENT_STORE_FILE
+    buckets = compile_events_file(source, target)
+    print(f"Compiled {source} into {target} ({buckets} dates)")
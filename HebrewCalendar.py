@@ -0,0 +1,87 @@
+from datetime import date, timedelta
+from functools import lru_cache
+from typing import List, NamedTuple, Tuple
+
+from convertdate import hebrew
+
+# convertdate numbers months from Nisan (1); Adar is 12, and in leap years
+# 12 is Adar I and 13 is Adar II
+MONTH_NAMES = ['ניסן', 'אייר', 'סיוון', 'תמוז', 'אב', 'אלול',
+               'תשרי', 'חשוון', 'כסלו', 'טבת', 'שבט', 'אדר']
+LEAP_ADAR_NAMES = {12: "אדר א'", 13: "אדר ב'"}
+DAY_NAMES = ['א', 'ב', 'ג', 'ד', 'ה', 'ו', 'ז', 'ח', 'ט', 'י',
+             'יא', 'יב', 'יג', 'יד', 'טו', 'טז', 'יז', 'יח', 'יט',
+             'כ', 'כא', 'כב', 'כג', 'כד', 'כה', 'כו', 'כז', 'כח', 'כט', 'ל']
+MONTH_ORDER = {month: i for i, month in enumerate(MONTH_NAMES[6:] + MONTH_NAMES[:6])}  # Tishrei first
+DAY_ORDINALS = {day: i + 1 for i, day in enumerate(DAY_NAMES)}
+
+
+class HebrewDay(NamedTuple):
+    gregorian: date
+    year: int
+    month: int  # convertdate numbering
+    day: int
+    day_name: str  # As in the archive: 'טו'
+    month_name: str  # For display: "אדר ב'" in leap years
+    archive_month: str  # Month key in hebrew_events.json: both Adars are 'אדר'
+
+    @property
+    def key(self) -> str:
+        """Sortable Hebrew date, YYYY-MM-DD in convertdate numbering"""
+        return f"{self.year:04d}-{self.month:02d}-{self.day:02d}"
+
+
+def month_names(year: int, month: int) -> Tuple[str, str]:
+    """(display name, archive name) of a Hebrew month"""
+    archive = MONTH_NAMES[min(month, 12) - 1]
+    if hebrew.leap(year) and month in LEAP_ADAR_NAMES:
+        return LEAP_ADAR_NAMES[month], archive
+    return archive, archive
+
+
+def _next_month(year: int, month: int) -> Tuple[int, int]:
+    if month == 6:  # Elul ends the year; Tishrei (7) starts the next
+        return year + 1, 7
+    if month == hebrew.year_months(year):
+        return year, 1
+    return year, month + 1
+
+
+@lru_cache(maxsize=16)
+def year_table(gregorian_year: int) -> Tuple[HebrewDay, ...]:
+    """
+    Hebrew date of every day of a Gregorian year. Only January 1st goes
+    through convertdate; the rest is walked forward with month lengths.
+    """
+    day = date(gregorian_year, 1, 1)
+    year, month, day_of_month = hebrew.from_gregorian(day.year, day.month, day.day)
+    names = month_names(year, month)
+    length = hebrew.month_days(year, month)
+    table = []
+    while day.year == gregorian_year:
+        table.append(HebrewDay(day, year, month, day_of_month, DAY_NAMES[day_of_month - 1], *names))
+        day += timedelta(days=1)
+        day_of_month += 1
+        if day_of_month > length:
+            year, month = _next_month(year, month)
+            day_of_month = 1
+            names = month_names(year, month)
+            length = hebrew.month_days(year, month)
+    return tuple(table)
+
+
+def hebrew_day(day: date) -> HebrewDay:
+    """Hebrew date for a Gregorian date (datetimes are truncated to their date)"""
+    return year_table(day.year)[day.timetuple().tm_yday - 1]
+
+
+def calendar_range(start: date, days: int) -> List[HebrewDay]:
+    """Hebrew dates for `days` consecutive days from `start`"""
+    table = []
+    day = date(start.year, start.month, start.day)
+    while len(table) < days:
+        year = year_table(day.year)
+        offset = day.timetuple().tm_yday - 1
+        table.extend(year[offset:offset + days - len(table)])
+        day = date(day.year + 1, 1, 1)
+    return table
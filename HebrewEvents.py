@@ -3,8 +3,17 @@ from bs4 import BeautifulSoup
 import re
 import urllib3
 import json
+import os
 import urllib.parse
+import argparse
+import time
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 from convertdate import hebrew
+from EventStore import EventStore, compile_events_file, event_id, EVENT_STORE_FILE
+from EventDatabase import EventDatabase, compile_event_database, EVENT_DB_FILE
+from HebrewCalendar import DAY_ORDINALS, MONTH_ORDER
+from HttpCache import CachingAdapter, default_http_cache
 
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
@@ -19,73 +28,161 @@ def clean_event_text(text):
     text = ' '.join(text.split())
     return text
 
-def get_month_events(month_name, url):
+SCRAPE_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+HEBREW_MONTHS = [
+    'ניסן', 'אייר', 'סיוון', 'תמוז', 'אב', 'אלול',
+    'תשרי', 'חשוון', 'כסלו', 'טבת', 'שבט', 'אדר' ]
+WIKIPEDIA_BASE_URL = os.getenv('WIKIPEDIA_BASE_URL', 'https://he.wikipedia.org')
+MONTHS_URL = f'{WIKIPEDIA_BASE_URL}/wiki/ויקיפדיה:אירועים_בלוח_העברי/'
+SCRAPE_CONCURRENCY = 12  # one connection per month page
+
+def parse_month_events(month_name, html):
     """
-    Get events for a specific Hebrew month from Wikipedia
+    Parse the events table of a Hebrew month page
     """
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
-    
+    soup = BeautifulSoup(html, 'html.parser')
+    events = []
+
+    rows = soup.find_all('tr')
+
+    for row in rows:
+        date_cell = row.find('td', style=lambda x: x and 'text-align:center' in x)
+        content_cell = row.find('td', style=lambda x: x and 'text-align:right' in x)        
+        if date_cell and content_cell:
+            date_link = date_cell.find('a')
+            if date_link and date_link.get('title'):
+                date = date_link.get('title')
+                events_list = content_cell.find('ul')
+                if events_list:
+                    for event in events_list.find_all('li'):
+                        b_tag = event.find('b')
+                        if b_tag:
+                            tag=b_tag.find('a')
+                            if tag:
+                                subject_url = tag.get('href')
+                                subject_url = f'https://he.wikipedia.org{urllib.parse.unquote(subject_url)}'  # Decode the URL to Hebrew text
+                                subject = tag.get('title')
+                                event_text = clean_event_text(event.get_text().strip())
+                                events.append({
+                                    'month': month_name,
+                                    'date': date,
+                                    'event': event_text,
+                                    'subject_url': subject_url,
+                                    'subject': subject
+                                })
+
+    return events
+
+def scrape_session(pool_size=1):
+    """
+    Pooled session for the scraper; month pages are served from and revalidated
+    against the shared on-disk HTTP cache
+    """
+    session = requests.Session()
+    cache = default_http_cache()
+    if cache:
+        adapter = CachingAdapter(cache, pool_connections=1, pool_maxsize=pool_size)
+    else:
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+def _fetch_month_page(session, month_name, url):
+    """
+    Download a month page; returns (html or error message, seconds spent)
+    """
+    start = time.perf_counter()
     try:
-        response = requests.get(url, headers=headers, verify=False)
+        response = session.get(url, headers=SCRAPE_HEADERS, verify=False)
         response.encoding = 'utf-8'
-        
         if response.status_code != 200:
-            return f"Error: Unable to fetch the webpage for {month_name}"
-        
-        soup = BeautifulSoup(response.text, 'html.parser')
-        events = []
-        
-        rows = soup.find_all('tr')
-        
-        for row in rows:
-            date_cell = row.find('td', style=lambda x: x and 'text-align:center' in x)
-            content_cell = row.find('td', style=lambda x: x and 'text-align:right' in x)        
-            if date_cell and content_cell:
-                date_link = date_cell.find('a')
-                if date_link and date_link.get('title'):
-                    date = date_link.get('title')
-                    events_list = content_cell.find('ul')
-                    if events_list:
-                        for event in events_list.find_all('li'):
-                            b_tag = event.find('b')
-                            if b_tag:
-                                tag=b_tag.find('a')
-                                if tag:
-                                    subject_url = tag.get('href')
-                                    subject_url = f'https://he.wikipedia.org{urllib.parse.unquote(subject_url)}'  # Decode the URL to Hebrew text
-                                    subject = tag.get('title')
-                                    event_text = clean_event_text(event.get_text().strip())
-                                    events.append({
-                                        'month': month_name,
-                                        'date': date,
-                                        'event': event_text,
-                                        'subject_url': subject_url,
-                                        'subject': subject
-                                    })
-        
-        return events
-    
+            return f"Error: Unable to fetch the webpage for {month_name}", time.perf_counter() - start
+        return response.text, time.perf_counter() - start
+    except Exception as e:
+        return f"Error occurred for {month_name}: {str(e)}", time.perf_counter() - start
+
+def get_month_events(month_name, url, session=None):
+    """
+    Get events for a specific Hebrew month from Wikipedia
+    """
+    html, _ = _fetch_month_page(session or requests, month_name, url)
+    if html.startswith('Error'):
+        return html
+
+    try:
+        return parse_month_events(month_name, html)
     except Exception as e:
         return f"Error occurred for {month_name}: {str(e)}"
 
-def get_all_hebrew_months_events():
+def _timed_parse(month_name, html):
+    start = time.perf_counter()
+    events = parse_month_events(month_name, html)
+    return events, time.perf_counter() - start
+
+def get_all_hebrew_months_events_concurrent(concurrency=SCRAPE_CONCURRENCY, session=None):
+    """
+    Get events for all Hebrew months, fetching pages in parallel over one pooled
+    session and parsing them in a process pool as they arrive
+    """
+    if session is None:
+        session = scrape_session(concurrency)
+
+    started = time.perf_counter()
+    results = {}
+    timings = {}
+    with ThreadPoolExecutor(max_workers=concurrency) as fetchers, ProcessPoolExecutor() as parsers:
+        fetches = {
+            fetchers.submit(_fetch_month_page, session, month_name, f"{MONTHS_URL}{month_name}"): month_name
+            for month_name in HEBREW_MONTHS
+        }
+        parses = {}
+        for future in as_completed(fetches):
+            month_name = fetches[future]
+            html, fetch_time = future.result()
+            timings[month_name] = {'fetch': fetch_time, 'parse': 0.0}
+            if html.startswith('Error'):
+                results[month_name] = html
+                continue
+            parses[parsers.submit(_timed_parse, month_name, html)] = month_name
+
+        for future in as_completed(parses):
+            month_name = parses[future]
+            try:
+                results[month_name], timings[month_name]['parse'] = future.result()
+            except Exception as e:
+                results[month_name] = f"Error occurred for {month_name}: {str(e)}"
+
+    all_events = []
+    for month_name in HEBREW_MONTHS:
+        month_events = results[month_name]
+        t = timings[month_name]
+        if isinstance(month_events, list):
+            print(f"{month_name}: {len(month_events)} events (fetch {t['fetch']:.2f}s, parse {t['parse']:.2f}s)")
+            all_events.extend(month_events)
+        else:
+            print(month_events)
+    print(f"Fetched {len(HEBREW_MONTHS)} months in {time.perf_counter() - started:.2f}s")
+
+    return all_events
+
+def get_all_hebrew_months_events(concurrency=None):
     """
     Get events for all Hebrew months
     """
-    hebrew_months = [
-        'ניסן', 'אייר', 'סיוון', 'תמוז', 'אב', 'אלול',
-        'תשרי', 'חשוון', 'כסלו', 'טבת', 'שבט', 'אדר' ]
+    if concurrency:
+        return get_all_hebrew_months_events_concurrent(concurrency)
 
-    url_str = 'https://he.wikipedia.org/wiki/ויקיפדיה:אירועים_בלוח_העברי/'
     all_events = []
+    session = scrape_session()
     
     # for month_name, url in months_urls.items():
-    for month_name in hebrew_months:
-        url = f"{url_str}{month_name}"
+    for month_name in HEBREW_MONTHS:
+        url = f"{MONTHS_URL}{month_name}"
         print(f"Fetching events for {month_name}...")
-        month_events = get_month_events(month_name, url)
+        month_events = get_month_events(month_name, url, session)
         
         if isinstance(month_events, list):
             all_events.extend(month_events)
@@ -117,37 +214,151 @@ def gematria(hebrew_year):
 
     return value
 
-def save_events_to_file(events, filename='hebrew_events.json'):
-    filtered_events = []
+@lru_cache(maxsize=None)
+def hebrew_year_to_gregorian(hebrew_year):
+    """
+    Gregorian year in which a Hebrew year (e.g. ה'תש"ח) begins; many events
+    share a year, so each is converted once.
+    """
+    return hebrew.to_gregorian(gematria(hebrew_year), 1, 1)[0]  # Convert using the first day of the Hebrew year
+
+def normalize_event(event):
+    """
+    Turn a scraped row into an archive event (year split off the text, day
+    normalized, Gregorian year added), or None if it has no Hebrew year or
+    falls outside the archive's range.
+    """
+    event_text = event['event']
+    first_word = event_text.split()[0]
+    # Check if the first word matches the Hebrew year format
+    if not re.match(r'^[א-ת]\'[א-ת]{1,3}"[א-ת]$', first_word):
+        return None
+    gregorian_year = hebrew_year_to_gregorian(first_word)
+    if not -600 < gregorian_year < 1940:  # Filter out events outside this range
+        return None
+    text = ' '.join(event_text.split()[1:])[2:]  # Remove the year and the leading '- '
+    day = event['date'].split()[0].replace('"', '').replace("'", "")  # Hebrew day without " and '
+    normalized = {
+        'month': event['month'],
+        'event': text,
+        'subject_url': event['subject_url'],
+        'subject': event['subject'],
+        'year': first_word,
+        'gregorian_year': gregorian_year,
+        'day': day,
+    }
+    return {'id': event_id(normalized), **normalized}
+
+def archive_order(event):
+    """Sort key: Tishrei-first month, then the numeric Hebrew day (so י sorts before יא)"""
+    return MONTH_ORDER[event['month']], DAY_ORDINALS.get(event['day'], 0)
+
+def load_archive(filename):
     try:
-        for event in events:
-            event_text = event['event']
-            first_word = event_text.split()[0]
-            # Check if the first word matches the Hebrew year format
-            if re.match(r'^[א-ת]\'[א-ת]{1,3}"[א-ת]$', first_word):
-                event['year'] = first_word
-                heb_year = event['year']
-                # Convert Hebrew year to Gregorian year
-                gregorian_year = hebrew.to_gregorian(gematria(heb_year), 1, 1)[0]  # Convert using the first day of the Hebrew year
-                event['gregorian_year'] = gregorian_year
-                event['event'] = ' '.join(event_text.split()[1:])  # Remove the year from the event text
-                event['event'] = event['event'][2:]  # Remove the leading '- '
-                day = event['date'].split()[0]  # Extract the Hebrew day
-                day = day.replace('"', '').replace("'", "")  # Remove " and ' characters
-                event['day'] = day
-                del event['date']  # Remove the original 'date' field
-                if gregorian_year > -600 and gregorian_year < 1940:  # Filter out events outside this range
-                    filtered_events.append(event)
-
-        with open(filename, 'w', encoding='utf-8') as f:
-            hebrew_month_order = ['תשרי', 'חשוון', 'כסלו', 'טבת', 'שבט', 'אדר', 'ניסן', 'אייר', 'סיוון', 'תמוז', 'אב', 'אלול']
-            filtered_events.sort(key=lambda x: (hebrew_month_order.index(x['month']), x['day']))
-
-            json.dump(filtered_events, f, ensure_ascii=False, indent=4)
+        with open(filename, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return []
+
+def merge_events(archive, scraped, keep_archived=True):
+    """
+    Merge normalized scraped events into the archive by id. Scraped fields
+    replace the archived ones, and any other fields on archived events
+    (metadata added later) are kept. Months missing from the scrape (a failed
+    download) keep their archived events. With keep_archived=False only the
+    scrape is kept, and the diff (against the archive) lists every archived
+    event the rewrite drops, including those of months missing from the scrape.
+    Returns (events, diff).
+    """
+    existing = {event_id(e): e for e in archive}
+    scraped_months = {e['month'] for e in scraped}
+    diff = {'added': [], 'changed': [], 'removed': []}
+    merged = {}
+    for event in scraped:
+        key = event['id']
+        if key in merged:
+            continue  # Same event listed twice on the page
+        old = existing.get(key)
+        if old is None:
+            merged[key] = event
+            diff['added'].append(event)
+            continue
+        updated = {'id': key, **old, **event}
+        if updated != {'id': key, **old}:
+            diff['changed'].append(updated)
+        merged[key] = updated if keep_archived else event
+
+    for key, old in existing.items():
+        if key in merged:
+            continue
+        if keep_archived and old['month'] not in scraped_months:
+            merged[key] = {'id': key, **old}
+        else:
+            diff['removed'].append(old)
+
+    events = sorted(merged.values(), key=archive_order)
+    return events, diff
+
+def save_events_to_file(events, filename='hebrew_events.json', incremental=True):
+    """
+    Normalize scraped events, merge them into the existing archive and
+    rewrite the file only if something changed. With incremental=False the
+    archive is rebuilt from the scrape alone (archived metadata is dropped).
+    Returns the diff: lists of added, changed and removed events.
+    """
+    diff = {'added': [], 'changed': [], 'removed': []}
+    try:
+        scraped = [e for e in map(normalize_event, events) if e]
+        archive = load_archive(filename)
+        merged, diff = merge_events(archive, scraped, keep_archived=incremental)
+        if archive == merged:
+            print(f"{filename} is up to date ({len(merged)} events)")
+            return diff
+
+        tmp = f"{filename}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(merged, f, ensure_ascii=False, indent=4)
+        os.replace(tmp, filename)
+        print(f"Wrote {len(merged)} events to {filename}: {len(diff['added'])} added, "
+              f"{len(diff['changed'])} changed, {len(diff['removed'])} removed")
+        for sign, kind in (('+', 'added'), ('~', 'changed'), ('-', 'removed')):
+            for e in diff[kind]:
+                print(f"  {sign} {e['day']} {e['month']} {e['year']}: {e['subject']}")
     except Exception as e:
         print(f"Error saving events to file: {e}")
+    return diff
 
 # Run the scraper
 if __name__ == "__main__":
-    all_events = get_all_hebrew_months_events()
-    save_events_to_file(all_events)
+    parser = argparse.ArgumentParser(description="Scrape Hebrew calendar events from Wikipedia")
+    parser.add_argument('--concurrency', type=int, default=SCRAPE_CONCURRENCY,
+                        help="parallel month downloads (0 fetches months one after another)")
+    parser.add_argument('--full-rebuild', action='store_true',
+                        help="rebuild the archive from this scrape alone instead of merging into it")
+    parser.add_argument('--sqlite', action='store_true',
+                        help=f"also build the SQLite database ({EVENT_DB_FILE}); kept up to date once it exists")
+    args = parser.parse_args()
+
+    all_events = get_all_hebrew_months_events(args.concurrency)
+    cache = default_http_cache()
+    if cache:
+        s = cache.stats
+        print(f"HTTP cache: {s['hits']} hits, {s['revalidated']} revalidated, {s['misses']} misses")
+    diff = save_events_to_file(all_events, incremental=not args.full_rebuild)
+    try:
+        store = EventStore(EVENT_STORE_FILE)
+        stale = store.is_stale()
+        store.close()
+    except (OSError, ValueError):
+        stale = True
+    if any(diff.values()) or stale:
+        compile_events_file()
+    if args.sqlite or os.path.exists(EVENT_DB_FILE):
+        try:
+            db = EventDatabase(EVENT_DB_FILE)
+            stale = db.is_stale()
+            db.close()
+        except (OSError, ValueError):
+            stale = True
+        if any(diff.values()) or stale:
+            compile_event_database()
@@ -0,0 +1,301 @@
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Any, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from RateLimiter import RateLimiter, rate_limiter, retry_after
+
+HTTP_CACHE_DIR = os.getenv('HTTP_CACHE_DIR', '.http_cache')
+HTTP_CACHE_MAX_BYTES = 200 * 1024 * 1024
+HTTP_CACHE_TTL = 6 * 60 * 60  # Serve without revalidation for this long (seconds)
+CACHED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified')
+
+
+class HttpCache:
+    """
+    On-disk cache of GET response bodies. Entries younger than the TTL are served
+    directly; older ones are revalidated with ETag / Last-Modified. The total size
+    is bounded by evicting the least recently used entries.
+    """
+    def __init__(self, directory: str = HTTP_CACHE_DIR, max_bytes: int = HTTP_CACHE_MAX_BYTES,
+                 ttl: float = HTTP_CACHE_TTL):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.stats = {'hits': 0, 'revalidated': 0, 'misses': 0, 'evicted': 0}
+        self._lock = threading.Lock()
+        self._total_bytes: Optional[int] = None
+        os.makedirs(directory, exist_ok=True)
+
+    def _paths(self, url: str) -> Tuple[str, str]:
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        base = os.path.join(self.directory, key)
+        return f"{base}.json", f"{base}.body"
+
+    def _count(self, stat: str) -> None:
+        with self._lock:
+            self.stats[stat] += 1
+
+    def lookup(self, url: str) -> Optional[Dict[str, Any]]:
+        """Cached metadata for a URL, or None"""
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get('url') != url or not os.path.exists(body_path):
+            return None
+        return meta
+
+    def is_fresh(self, meta: Dict[str, Any]) -> bool:
+        return time.time() - meta['stored_at'] < self.ttl
+
+    def read_body(self, url: str) -> bytes:
+        _, body_path = self._paths(url)
+        with open(body_path, 'rb') as f:
+            body = f.read()
+        os.utime(body_path)  # Body mtime doubles as the LRU access time
+        return body
+
+    def store(self, url: str, headers, body: bytes) -> None:
+        writer = self.writer(url, headers)
+        writer.write(body)
+        writer.commit()
+
+    def writer(self, url: str, headers) -> 'CacheWriter':
+        """Writer for a body that arrives in chunks; see CacheWriter"""
+        return CacheWriter(self, url, headers)
+
+    def validators(self, meta: Optional[Dict[str, Any]]) -> Dict[str, str]:
+        """Conditional request headers that revalidate a cached entry"""
+        headers = {}
+        if meta and 'ETag' in meta['headers']:
+            headers['If-None-Match'] = meta['headers']['ETag']
+        if meta and 'Last-Modified' in meta['headers']:
+            headers['If-Modified-Since'] = meta['headers']['Last-Modified']
+        return headers
+
+    def _added(self, size: int) -> None:
+        with self._lock:
+            if self._total_bytes is not None:
+                self._total_bytes += size
+            over = self._total_bytes is None or self._total_bytes > self.max_bytes
+        if over:
+            self.evict()
+
+    def refresh(self, url: str, meta: Dict[str, Any], headers) -> None:
+        """Restart the TTL of an entry after a 304, picking up new validators"""
+        meta['stored_at'] = time.time()
+        for h in ('ETag', 'Last-Modified'):
+            if h in headers:
+                meta['headers'][h] = headers[h]
+        meta_path, _ = self._paths(url)
+        _atomic_write(meta_path, json.dumps(meta, ensure_ascii=False).encode('utf-8'))
+
+    def evict(self) -> None:
+        """Drop least recently used entries until the cache fits in max_bytes"""
+        entries = []
+        total = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith('.body'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+        if total > self.max_bytes:
+            for _, size, path in sorted(entries):
+                for p in (path, path[:-len('.body')] + '.json'):
+                    try:
+                        os.remove(p)
+                    except OSError:
+                        pass
+                total -= size
+                self._count('evicted')
+                if total <= self.max_bytes:
+                    break
+        with self._lock:
+            self._total_bytes = total
+
+    def log_stats(self, label: str = "HTTP cache") -> None:
+        s = self.stats
+        logging.info(
+            f"{label}: {s['hits']} hits, {s['revalidated']} revalidated (304), "
+            f"{s['misses']} misses, {s['evicted']} evicted"
+        )
+
+
+class CacheWriter:
+    """
+    Body of one response written to a temporary file as it is read, so a
+    streamed download is cached without being held in memory. The entry only
+    enters the cache on commit(), once the whole body has been read; a body
+    abandoned partway (e.g. extraction stopped early) is discarded.
+    """
+    def __init__(self, cache: HttpCache, url: str, headers):
+        self.cache = cache
+        self.url = url
+        self.headers = {h: headers[h] for h in CACHED_HEADERS if h in headers}
+        self.size = 0
+        _, body_path = cache._paths(url)
+        self._tmp = f"{body_path}.{os.getpid()}.{id(self)}.tmp"  # Unique among concurrent downloads
+        self._file = open(self._tmp, 'wb')
+
+    def write(self, chunk: bytes) -> None:
+        if self._file is not None:
+            self._file.write(chunk)
+            self.size += len(chunk)
+
+    def commit(self) -> None:
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+        meta_path, body_path = self.cache._paths(self.url)
+        meta = {
+            'url': self.url,
+            'stored_at': time.time(),
+            'size': self.size,
+            'headers': self.headers,
+        }
+        os.replace(self._tmp, body_path)
+        _atomic_write(meta_path, json.dumps(meta, ensure_ascii=False).encode('utf-8'))
+        self.cache._added(self.size)
+
+    def discard(self) -> None:
+        """Drop an uncommitted body; a no-op after commit()"""
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+        try:
+            os.remove(self._tmp)
+        except OSError:
+            pass
+
+
+def _atomic_write(path: str, data: bytes) -> None:
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class LimitedAdapter(HTTPAdapter):
+    """
+    Transport adapter that sends through the process-wide per-host limits:
+    waits for the host's rate and Retry-After pauses, reports each outcome
+    to its circuit breaker, and raises RateLimiter.CircuitOpen while the
+    circuit is open.
+    """
+    def __init__(self, limiter: Optional[RateLimiter] = None, **kwargs):
+        self.limiter = limiter or rate_limiter
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        host = self.limiter.host(request.url)
+        host.wait()
+        try:
+            response = super().send(request, **kwargs)
+        except requests.exceptions.RequestException:
+            host.record(None)
+            raise
+        host.record(response.status_code, retry_after(response.headers))
+        return response
+
+
+class CachingAdapter(LimitedAdapter):
+    """Transport adapter that serves GETs from an HttpCache and revalidates stale entries"""
+    def __init__(self, cache: HttpCache, **kwargs):
+        self.cache = cache
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        if request.method != 'GET':
+            return super().send(request, **kwargs)
+
+        url = request.url
+        meta = self.cache.lookup(url)
+        if meta and self.cache.is_fresh(meta):
+            self.cache._count('hits')
+            return self._cached_response(request, meta)
+
+        request.headers.update(self.cache.validators(meta))
+        response = super().send(request, **kwargs)
+        if response.status_code == 304 and meta:
+            self.cache._count('revalidated')
+            response.close()
+            self.cache.refresh(url, meta, response.headers)
+            return self._cached_response(request, meta)
+
+        self.cache._count('misses')
+        if response.status_code == 200:
+            # Copied to the cache as the caller reads it, so streamed bodies stay streamed
+            response.raw = _TeeRaw(response.raw, self.cache.writer(url, response.headers))
+        return response
+
+    def _cached_response(self, request, meta: Dict[str, Any]) -> requests.Response:
+        body = self.cache.read_body(request.url)
+        response = requests.Response()
+        response.status_code = 200
+        response.reason = 'OK'
+        response.headers = CaseInsensitiveDict(meta['headers'])
+        response.headers['Content-Length'] = str(len(body))
+        response.raw = io.BytesIO(body)
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        response.encoding = get_encoding_from_headers(response.headers)
+        return response
+
+
+class _TeeRaw:
+    """
+    Wraps a urllib3 response so the decoded body is copied into a CacheWriter
+    as requests reads it. The entry is committed when the body has been read
+    to the end and discarded if the response is closed before that.
+    """
+    def __init__(self, raw, writer: CacheWriter):
+        self._raw = raw
+        self._writer = writer
+
+    def stream(self, amt: int = 2 ** 16, decode_content: Optional[bool] = None):
+        # requests reads bodies (including .content) through raw.stream
+        for chunk in self._raw.stream(amt, decode_content=decode_content):
+            self._writer.write(chunk)
+            yield chunk
+        self._writer.commit()
+
+    def close(self) -> None:
+        self._writer.discard()
+        self._raw.close()
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+
+_default_cache: Optional[HttpCache] = None
+
+
+def default_http_cache() -> Optional[HttpCache]:
+    """Process-wide cache shared by all sessions; disabled when HTTP_CACHE_DIR is empty"""
+    global _default_cache
+    if _default_cache is None and HTTP_CACHE_DIR:
+        try:
+            _default_cache = HttpCache()
+        except OSError as e:
+            logging.warning(f"HTTP cache disabled: {str(e)}")
+    return _default_cache
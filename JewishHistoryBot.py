@@ -1,16 +1,33 @@
+import argparse
+import asyncio
+import codecs
+import hashlib
 import json
-import random
 import os
 import re
 import logging
-from typing import Dict, Any, Optional, List
-from datetime import datetime
-import requests
-from bs4 import BeautifulSoup
-from convertdate import hebrew
-import urllib3
+from typing import TYPE_CHECKING, Dict, Any, Optional, List, Tuple
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+from html.parser import HTMLParser
 import sys
 import time
+import signal
+import urllib.parse
+from EventStore import EventStore, EventIndex, EVENT_STORE_FILE
+from PostQueue import PostQueue
+from Publisher import FanOutPublisher, load_destinations, DEFAULT_LANGUAGE
+from AsyncTransport import AsyncTransport, DEFAULT_HEADERS, is_transient
+from RateLimiter import CircuitOpen, rate_limiter, backoff_delay
+from Telemetry import telemetry, RUN_REPORT_JSON, RUN_REPORT_MD
+from Compaction import compact_source, estimate_tokens, AI_INPUT_TOKEN_BUDGET
+from SummaryCache import SummaryCache, default_summary_cache
+
+# requests, bs4, convertdate and the profilers are imported where they are
+# used, so publishing a queued post starts without loading them
+if TYPE_CHECKING:
+    from EventDatabase import EventDatabase
+    from HttpCache import HttpCache
 
 # Configure logging for GitHub Actions
 logging.basicConfig(
@@ -27,194 +44,783 @@ def log_end_group():
     """End a collapsible group in GitHub Actions."""
     print("::endgroup::")
 
-
-# Suppress SSL warnings
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-
 # Configure constants
 API_TIMEOUT = 30
 MAX_CONTENT_LENGTH = 4000  # Truncate long Wikipedia content
+MAX_CONTENT_ELEMENTS = 10  # Leading p/h2/h3 elements taken from an article
+STREAM_CHUNK_SIZE = 16 * 1024
 REQUEST_RETRIES = 2
 AI_RETRY_ATTEMPTS = 3
-AI_RETRY_BACKOFF = 2
+AI_RETRY_BACKOFF = 2  # Base delay for jittered exponential backoff (seconds)
+AI_HEDGE_DELAY = 10  # Start the fallback provider if the primary has not answered by then (seconds)
+AI_LATENCY_BUDGET = 90  # Overall limit for the summary stage (seconds)
+AI_STREAMING = True  # Consume completions as server-sent events
+AI_BASE_URLS = {
+    'deepseek': os.getenv('DEEPSEEK_BASE_URL', "https://api.deepseek.com"),
+    'openai': os.getenv('OPENAI_BASE_URL', "https://api.openai.com"),
+}
+STREAM_CHECK_CHARS = 80  # Longest part of the first line to read before judging a stream's language
+STREAM_MAX_CHARS = 1800  # Close the stream well past the 700-1100 character target
+WIKIPEDIA_ORIGIN = "https://he.wikipedia.org"  # Origin of the archive's subject_url links
+WIKIPEDIA_BASE_URL = os.getenv('WIKIPEDIA_BASE_URL', WIKIPEDIA_ORIGIN)
+WIKIPEDIA_API_URL = os.getenv('WIKIPEDIA_API_URL', f"{WIKIPEDIA_BASE_URL}/w/api.php")
+TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL', "https://api.telegram.org")
+WIKI_BATCH_SIZE = 50  # Titles per API query (MediaWiki limit for regular clients)
+WIKI_EXTRACT_BATCH_SIZE = 20  # TextExtracts returns at most 20 intro extracts per query
 HEBREW_EVENTS_FILE = "hebrew_events.json"
 TELEGRAM_CHANNEL = "@kedmachat"
+PREGENERATE_DAYS = 7
+PREGENERATE_WORKERS = 4
+PLAN_DAYS = 365
+DAEMON_POST_TIME = os.getenv('DAEMON_POST_TIME', "07:00")
+DAEMON_TIMEZONE = "Asia/Jerusalem"
+DAEMON_SKIP_WEEKDAYS = {5}  # Saturday
+DAEMON_POLL_SECONDS = 60  # Longest sleep between checks of the schedule and the events file
+DAEMON_RETRY_DELAY = 3600  # Wait before retrying a failed post (seconds)
+DAEMON_STATE_FILE = "daemon_state.json"
+PROFILE_FILE = "profile.prof"
+PROFILE_SUMMARY_FILE = "profile.txt"
 
 
 class HTTPSession:
-    """Shared HTTP session with retries and common headers"""
-    def __init__(self):
+    """Shared HTTP session with common headers, sent through the per-host rate limits"""
+    def __init__(self, cache: Optional['HttpCache'] = None):
+        import requests
+        import urllib3
+        from HttpCache import CachingAdapter, LimitedAdapter
+
+        # Suppress SSL warnings
+        urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
         self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64)',
-            'Accept-Language': 'en-US,en;q=0.9',
-        })
+        self.session.headers.update(DEFAULT_HEADERS)
+        # With a cache, GETs go through it and are revalidated with conditional requests
+        adapter = CachingAdapter(cache) if cache is not None else LimitedAdapter()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
 
 class TelegramBot:
-    def __init__(self, token: str):
+    def __init__(self, token: str, transport: Optional[AsyncTransport] = None):
         if not token:
             raise ValueError("Telegram bot token is missing.")
         self.token = token
-        self.api_url = f"https://api.telegram.org/bot{token}/"
-        self.http = HTTPSession().session
+        self.api_url = f"{TELEGRAM_API_URL}/bot{token}/"
+        self.transport = transport  # Required by post_message_async
 
-    def send_message(self, chat_id: str, text: str) -> Dict[str, Any]:
-        """Sends a message to a Telegram chat."""
-        url = self.api_url + "sendMessage"
+    def _message_payload(self, chat_id: str, text: str, markdown: bool = True) -> Dict[str, Any]:
         payload = {
             "chat_id": chat_id,
             "text": text,
-            "parse_mode": "Markdown",
             "disable_web_page_preview": True
         }
-        
+        if markdown:
+            payload["parse_mode"] = "Markdown"
+        return payload
+
+    async def post_message_async(self, chat_id: str, text: str, markdown: bool = True) -> Dict[str, Any]:
+        """
+        Sends one message without retries and returns Telegram's response body
+        as-is, including error_code and parameters.retry_after on failures, so
+        the caller can schedule retries (see Publisher.FanOutPublisher).
+        """
+        if self.transport is None:
+            raise ValueError("post_message_async needs an AsyncTransport")
+        response = await self.transport.request(
+            'POST', self.api_url + "sendMessage", retries=0, scoped_429=True,
+            json=self._message_payload(chat_id, text, markdown)
+        )
+        telemetry.count('bytes', len(response.content))
         try:
-            response = self.http.post(url, json=payload, timeout=API_TIMEOUT)
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            logging.error(f"Telegram API error: {str(e)}")
-            return {}
+            result = response.json()
+        except ValueError:
+            result = {'ok': False, 'description': response.text[:200]}
+        if not result.get('ok'):
+            result.setdefault('error_code', response.status_code)
+            result.setdefault('description', f"HTTP {response.status_code}")
+        return result
+
+def clean_text(text: str) -> str:
+    """Cleans extracted element text from unwanted content"""
+    text = text.strip()
+
+    # Remove citation references and edit links
+    text = re.sub(r'\[\d+\]', '', text)
+    text = re.sub(r'\[edit\]', '', text)
+
+    return text if len(text) > 40 else ''  # Filter short elements
 
-class WikipediaClient:
-    def __init__(self):
-        self.http = HTTPSession().session
 
-    def fetch_content(self, url: str) -> str:
-        """Fetches main content from a Wikipedia page."""
+class _StopExtraction(Exception):
+    pass
+
+
+class StreamingContentExtractor(HTMLParser):
+    """
+    Incremental extractor for the article body. Only text inside
+    div.mw-parser-output is looked at, and parsing stops as soon as
+    MAX_CONTENT_ELEMENTS elements or MAX_CONTENT_LENGTH characters are collected,
+    so memory stays bounded however long the article is.
+    """
+    TARGET_TAGS = ('p', 'h2', 'h3')
+    SKIP_TAGS = ('style', 'script')
+
+    def __init__(self, max_elements: int = MAX_CONTENT_ELEMENTS, max_chars: int = MAX_CONTENT_LENGTH):
+        super().__init__(convert_charrefs=True)
+        self.max_elements = max_elements
+        self.max_chars = max_chars
+        self.found_content = False
+        self.done = False
+        self._parts: List[str] = []
+        self._chars = 0
+        self._elements = 0
+        self._div_depth = 0        # Open divs inside mw-parser-output (0 = outside)
+        self._capture_tag: Optional[str] = None
+        self._capture_depth = 0
+        self._skip_depth = 0
+        self._buffer: List[str] = []
+        self._buffer_len = 0
+
+    def handle_starttag(self, tag, attrs):
+        if self._div_depth == 0:
+            if tag == 'div' and 'mw-parser-output' in (dict(attrs).get('class') or '').split():
+                self.found_content = True
+                self._div_depth = 1
+            return
+        if tag == 'div':
+            self._div_depth += 1
+        if tag in self.SKIP_TAGS:
+            self._skip_depth += 1
+        elif self._capture_tag is None and tag in self.TARGET_TAGS:
+            self._capture_tag = tag
+            self._capture_depth = 1
+            self._buffer = []
+            self._buffer_len = 0
+        elif tag == self._capture_tag:
+            self._capture_depth += 1
+
+    def handle_endtag(self, tag):
+        if self._div_depth == 0:
+            return
+        if tag in self.SKIP_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+        elif tag == self._capture_tag:
+            self._capture_depth -= 1
+            if self._capture_depth == 0:
+                self._finish_element()
+        if tag == 'div':
+            self._div_depth -= 1
+            if self._div_depth == 0:
+                self._stop()
+
+    def handle_data(self, data):
+        # Cap a single element's buffer; anything past max_chars is cut later anyway
+        if self._capture_tag and not self._skip_depth and self._buffer_len < self.max_chars * 2:
+            self._buffer.append(data)
+            self._buffer_len += len(data)
+
+    def _finish_element(self):
+        text = clean_text(''.join(self._buffer))
+        self._capture_tag = None
+        self._buffer = []
+        self._buffer_len = 0
+        self._elements += 1
+        if text:
+            self._parts.append(text)
+            self._chars += len(' '.join(text.split())) + 1  # Length after _preprocess_content
+        if self._elements >= self.max_elements or self._chars >= self.max_chars:
+            self._stop()
+
+    def _stop(self):
+        self.done = True
+        raise _StopExtraction()
+
+    def feed(self, data):
+        if self.done:
+            return
         try:
-            response = self.http.get(url, timeout=API_TIMEOUT)
-            response.encoding = 'utf-8'
+            super().feed(data)
+        except _StopExtraction:
+            pass
+
+    def text(self) -> str:
+        return ' '.join(self._parts)
+
+    def result(self) -> str:
+        """Extracted text; raises if the page had no article body"""
+        if not self.found_content:
+            raise ValueError("Wikipedia content structure changed")
+        return self.text()
+
+
+def extract_content(html: str) -> str:
+    """Extracts the leading article content from a full Wikipedia page."""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, 'html.parser')
+    content_div = soup.find('div', {'class': 'mw-parser-output'})
+
+    if not content_div:
+        raise ValueError("Wikipedia content structure changed")
+
+    # Extract relevant content elements
+    elements = content_div.find_all(['p', 'h2', 'h3'])
+    cleaned_elements = [clean_text(e.get_text()) for e in elements[:MAX_CONTENT_ELEMENTS]]
+    return ' '.join(filter(None, cleaned_elements))
+
+
+def extract_content_streaming(chunks) -> str:
+    """Same extraction as extract_content over an iterable of text chunks, stopping early."""
+    extractor = StreamingContentExtractor()
+    for chunk in chunks:
+        extractor.feed(chunk)
+        if extractor.done:
+            break
+    return extractor.result()
+
+
+def title_from_url(url: str) -> str:
+    """Article title for a https://he.wikipedia.org/wiki/... URL"""
+    title = urllib.parse.unquote(url.split('/wiki/', 1)[-1]).split('#', 1)[0]
+    return title.replace('_', ' ')
+
+
+class WikipediaClient:
+    def __init__(self, cache: Optional['HttpCache'] = None, api_url: str = WIKIPEDIA_API_URL,
+                 base_url: str = WIKIPEDIA_BASE_URL, transport: Optional[AsyncTransport] = None):
+        from HttpCache import default_http_cache
+
+        self.cache = cache or default_http_cache()
+        self._http = None
+        self.transport = transport  # Used by fetch_content_async and fetch_html_async
+        self.api_url = api_url
+        self.base_url = base_url
+        self.api_requests = 0
+
+    @property
+    def http(self):
+        """requests session for fetch_pages, created on first use"""
+        if self._http is None:
+            self._http = HTTPSession(self.cache).session
+        return self._http
+
+    def fetch_pages(self, titles: List[str], extracts: bool = True) -> Dict[str, Dict[str, Any]]:
+        """
+        Resolves many article titles with batched MediaWiki API queries.
+
+        Returns {title: {'status': 'ok' | 'redirect' | 'missing' | 'invalid' | 'error',
+        'title': resolved title, 'extract': plain-text intro}} for every input title.
+        """
+        titles = list(dict.fromkeys(t for t in titles if t))
+        batch_size = WIKI_EXTRACT_BATCH_SIZE if extracts else WIKI_BATCH_SIZE
+        results: Dict[str, Dict[str, Any]] = {}
+        for i in range(0, len(titles), batch_size):
+            batch = titles[i:i + batch_size]
+            try:
+                results.update(self._query_batch(batch, extracts))
+            except Exception as e:
+                logging.error(f"Wikipedia API batch failed ({len(batch)} titles): {str(e)}")
+                results.update({t: {'status': 'error', 'title': t, 'extract': ''} for t in batch})
+        return results
+
+    def _query_batch(self, batch: List[str], extracts: bool) -> Dict[str, Dict[str, Any]]:
+        params = {
+            'action': 'query',
+            'format': 'json',
+            'formatversion': '2',
+            'redirects': '1',
+            'titles': '|'.join(batch),
+        }
+        if extracts:
+            params.update({
+                'prop': 'extracts',
+                'explaintext': '1',
+                'exintro': '1',
+                'exlimit': 'max',
+            })
+        else:
+            params['prop'] = 'info'
+
+        normalized: Dict[str, str] = {}
+        redirects: Dict[str, str] = {}
+        pages: Dict[str, Dict[str, Any]] = {}
+        cont: Dict[str, str] = {}
+        while True:
+            # POST keeps long multi-title queries clear of URL length limits
+            with telemetry.span('wikipedia.api_query', titles=len(batch)):
+                response = self.http.post(self.api_url, data={**params, **cont}, timeout=API_TIMEOUT)
+                telemetry.count('bytes', len(response.content))
+            self.api_requests += 1
             response.raise_for_status()
+            data = response.json()
+            query = data.get('query', {})
+            normalized.update({n['from']: n['to'] for n in query.get('normalized', [])})
+            redirects.update({r['from']: r['to'] for r in query.get('redirects', [])})
+            for page in query.get('pages', []):
+                merged = pages.setdefault(page['title'], {})
+                for key, value in page.items():
+                    if value or key not in merged:
+                        merged[key] = value
+            if 'continue' not in data:
+                break
+            cont = data['continue']
+
+        results = {}
+        for title in batch:
+            resolved = normalized.get(title, title)
+            redirected = resolved in redirects
+            resolved = redirects.get(resolved, resolved)
+            page = pages.get(resolved, {})
+            if page.get('invalid'):
+                status = 'invalid'
+            elif page.get('missing') or not page:
+                status = 'missing'
+            else:
+                status = 'redirect' if redirected else 'ok'
+            results[title] = {'status': status, 'title': resolved, 'extract': page.get('extract', '')}
+        return results
 
-            soup = BeautifulSoup(response.text, 'html.parser')
-            content_div = soup.find('div', {'class': 'mw-parser-output'})
+    def page_url(self, url: str) -> str:
+        """Points an archive subject_url at the configured Wikipedia base URL"""
+        if self.base_url != WIKIPEDIA_ORIGIN and url.startswith(WIKIPEDIA_ORIGIN):
+            return self.base_url + url[len(WIKIPEDIA_ORIGIN):]
+        return url
 
-            if not content_div:
-                raise ValueError("Wikipedia content structure changed")
+    async def fetch_content_async(self, url: str) -> str:
+        """
+        Fetches the leading article content from a Wikipedia page over the
+        shared transport, through the HTTP cache, stopping once enough is read.
+        """
+        if self.transport is None:
+            raise ValueError("fetch_content_async needs an AsyncTransport")
+        url = self.page_url(url)
+        try:
+            with telemetry.span('wikipedia.stream_extract'):
+                meta = self.cache.lookup(url) if self.cache else None
+                if meta and self.cache.is_fresh(meta):
+                    self.cache._count('hits')
+                    return self._extract_cached(url)
 
-            # Extract relevant content elements
-            elements = content_div.find_all(['p', 'h2', 'h3'])
-            cleaned_elements = [self._clean_element(e) for e in elements[:10]]  # First 10 elements
-            return ' '.join(filter(None, cleaned_elements))
+                extractor = StreamingContentExtractor()
+                headers = self.cache.validators(meta) if self.cache else {}
+                async with self.transport.stream('GET', url, headers=headers) as response:
+                    if response.status_code == 304 and meta:
+                        self.cache._count('revalidated')
+                        self.cache.refresh(url, meta, response.headers)
+                        return self._extract_cached(url)
+                    if self.cache:
+                        self.cache._count('misses')
+                    response.raise_for_status()
+                    # The body goes to the cache as it arrives; stopping early leaves it uncached
+                    writer = self.cache.writer(url, response.headers) if self.cache else None
+                    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+                    try:
+                        async for chunk in response.aiter_bytes(STREAM_CHUNK_SIZE):
+                            if writer:
+                                writer.write(chunk)
+                            extractor.feed(decoder.decode(chunk))
+                            if extractor.done:
+                                break
+                        else:
+                            if writer:
+                                writer.commit()
+                    finally:
+                        if writer:
+                            writer.discard()
+                    telemetry.count('bytes', response.num_bytes_downloaded)
+                return extractor.result()
 
         except Exception as e:
             logging.error(f"Wikipedia fetch failed for {url}: {str(e)}")
             return ""
 
-    def _clean_element(self, element) -> str:
-        """Cleans HTML elements from unwanted content"""
-        text = element.get_text().strip()
-        
-        # Remove citation references and edit links
-        text = re.sub(r'\[\d+\]', '', text)
-        text = re.sub(r'\[edit\]', '', text)
-        
-        return text if len(text) > 40 else ''  # Filter short elements
+    def _extract_cached(self, url: str) -> str:
+        html = self.cache.read_body(url).decode('utf-8')
+        return extract_content_streaming(
+            html[i:i + STREAM_CHUNK_SIZE] for i in range(0, len(html), STREAM_CHUNK_SIZE)
+        )
+
+    async def fetch_html_async(self, url: str) -> str:
+        """Whole article page over the shared transport (through the HTTP cache when enabled); raises on errors"""
+        if self.transport is None:
+            raise ValueError("fetch_html_async needs an AsyncTransport")
+        url = self.page_url(url)
+        if self.cache:
+            return await self._cached_get_async(url)
+        response = await self.transport.request('GET', url)
+        telemetry.count('bytes', len(response.content))
+        response.raise_for_status()
+        return response.content.decode('utf-8')
+
+    async def _cached_get_async(self, url: str) -> str:
+        """GET through the HTTP cache: fresh entries are served, stale ones revalidated"""
+        meta = self.cache.lookup(url)
+        if meta and self.cache.is_fresh(meta):
+            self.cache._count('hits')
+            return self.cache.read_body(url).decode('utf-8')
+
+        response = await self.transport.request('GET', url, headers=self.cache.validators(meta))
+        if response.status_code == 304 and meta:
+            self.cache._count('revalidated')
+            self.cache.refresh(url, meta, response.headers)
+            return self.cache.read_body(url).decode('utf-8')
+
+        self.cache._count('misses')
+        telemetry.count('bytes', len(response.content))
+        response.raise_for_status()
+        self.cache.store(url, response.headers, response.content)
+        return response.content.decode('utf-8')
+
+# Kept byte-identical across calls so providers can serve it from their prompt cache
+SYSTEM_PROMPT = (
+    'אתה כותב את גוף הטקסט (בעברית בלבד) לפוסט בערוץ טלגרם של "קדמא" '
+    'על דמות או אירוע מההיסטוריה היהודית.\n'
+    'מטרה: פוסט מעניין, מהותי ומדויק היסטורית — לא תקציר יבש ולא רשימת תאריכים.\n\n'
+    'מבנה ואורך:\n'
+    '- 3 עד 5 פסקאות קצרות, סך הכל כ־700–1100 תווים (בערך 120–200 מילים).\n'
+    '- פתיחה עם וו (Hook) קצר שמסביר למה הדמות/האירוע משמעותיים.\n'
+    '- אחר כך רקע היסטורי, פועלו/משמעותו, והשפעה לדורות.\n'
+    '- סיום עם משפט תובנה או הקשר רחב יותר.\n\n'
+    'סגנון:\n'
+    '- עברית תקנית, זורמת, בגובה העיניים — לא מליצית ולא ויקיפדית.\n'
+    '- הדגש שמות, מקומות, ספרים ותאריכי מפתח עם **bold** של Markdown.\n'
+    '- אפשר 1–3 אימוג׳ים עדינים ורלוונטיים (למשל 🕯️📜✡️📚), לא יותר.\n'
+    '- שלב פרטים קונקרטיים מהמקור (שמות חיבורים, תלמידים, ערים, שנים) — לא הכללות.\n\n'
+    'איסורים:\n'
+    '- אל תכתוב שורה שמתארת את המשימה (כמו "הנה פוסט", "פוסט היסטורי", "להלן", '
+    '"זהו פוסט", "קצר ומדויק לטלגרם") ואל תוסיף הקדמות באנגלית.\n'
+    '- אל תוסיף קווים מפרידים (---), כותרות סעיפים, או שורת תאריך/כותרת — '
+    'הן מתווספות אוטומטית מסביב לטקסט שלך.\n'
+    '- אל תמציא עובדות שלא מופיעות במקור; אם פרט לא ברור, השמט אותו.\n'
+    '- אל תתחיל ב"ביום זה" או ב"היום" — תאריך כבר מופיע מעל הפוסט.'
+)
+USER_PROMPT_PREFIX = (
+    'הטקסט הבא הוא תקציר ויקיפדיה על נושא הפוסט. כתוב על בסיסו את גוף הפוסט בלבד, '
+    'לפי ההנחיות שבמערכת. החזר רק את גוף הפוסט — בלי הקדמה, בלי הסבר, בלי כותרת.\n\n'
+    'מקור:\n"""\n'
+)
+# Part of every summary cache key, so editing either prompt invalidates cached summaries
+PROMPT_VERSION = hashlib.sha256((SYSTEM_PROMPT + USER_PROMPT_PREFIX).encode('utf-8')).hexdigest()[:12]
+
+
+class StreamAborted(Exception):
+    """A streamed completion was cut off because the output went off the rails"""
+
+
+class CompletionStream:
+    """
+    Incremental state of one streamed (server-sent events) completion.
+    Records time-to-first-token and throughput,
+    and stops early when the output starts with an English preamble
+    (StreamAborted, retried like any transient failure) or runs far past the
+    target length (cut back to the last full paragraph and returned).
+    """
+    def __init__(self, client: 'AIClient', provider: str):
+        self.client = client
+        self.provider = provider
+        self.start = time.monotonic()
+        self.first_token: Optional[float] = None
+        self.parts: List[str] = []
+        self.chunks = 0
+        self.usage: Dict[str, Any] = {}
+        self.aborted: Optional[str] = None
+        self.received = 0
+        self.checked = False
+
+    def feed(self, line: str) -> bool:
+        """Consume one SSE line; True once the stream should be closed"""
+        if not line or not line.startswith('data:'):
+            return False
+        data = line[len('data:'):].strip()
+        if data == '[DONE]':
+            return True
+        event = json.loads(data)
+        if event.get('usage'):
+            self.usage = event['usage']
+        delta = ''.join(
+            (choice.get('delta') or {}).get('content') or '' for choice in event.get('choices', [])
+        )
+        if not delta:
+            return False
+        if self.first_token is None:
+            self.first_token = time.monotonic() - self.start
+        self.parts.append(delta)
+        self.chunks += 1
+        self.received += len(delta)
+
+        # Judge the language once the (preamble-stripped) first line is complete or long enough
+        if not self.checked and ('\n' in delta or self.received >= STREAM_CHECK_CHARS):
+            head = self.client._strip_meta_preamble(''.join(self.parts))
+            line = head.split('\n', 1)[0][:STREAM_CHECK_CHARS]
+            if '\n' in head or len(line) >= STREAM_CHECK_CHARS:
+                self.checked = True
+                if self.client._is_english(line):
+                    raise StreamAborted(f"English preamble from {self.provider}: {line!r}")
+        if self.received > STREAM_MAX_CHARS:
+            self.aborted = 'length'
+            return True
+        return False
+
+    def result(self) -> Dict[str, Any]:
+        elapsed = time.monotonic() - self.start
+        text = self.client._strip_meta_preamble(''.join(self.parts))
+        if self.aborted == 'length':
+            cut = text.rfind('\n\n', 0, STREAM_MAX_CHARS)
+            text = text[:cut] if cut > 0 else text[:STREAM_MAX_CHARS]
+            logging.warning(
+                f"{self.provider.capitalize()} output passed {STREAM_MAX_CHARS} characters; stream closed early"
+            )
+
+        completion_tokens = self.usage.get('completion_tokens') or self.chunks
+        generation_time = elapsed - (self.first_token or 0)
+        stats = {
+            'ttft': round(self.first_token, 3) if self.first_token is not None else None,
+            'elapsed': round(elapsed, 3),
+            'tokens_per_second': round(completion_tokens / generation_time, 1) if generation_time > 0 else None,
+            'aborted': self.aborted,
+        }
+        logging.info(
+            f"{self.provider.capitalize()} stream: first token {stats['ttft']}s, "
+            f"{stats['tokens_per_second']} tokens/s, {elapsed:.1f}s total"
+        )
+        return {
+            'summary': text,
+            'ai': self.provider,
+            'model': self.client.models[self.provider],
+            'tokens_used': self.usage.get('total_tokens', 0),
+            'stream': stats,
+        }
+
 
 class AIClient:
-    def __init__(self):
-        self.http = HTTPSession().session
+    def __init__(self, hedge_delay: Optional[float] = AI_HEDGE_DELAY, latency_budget: float = AI_LATENCY_BUDGET,
+                 streaming: bool = AI_STREAMING, token_budget: Optional[int] = AI_INPUT_TOKEN_BUDGET,
+                 transport: Optional[AsyncTransport] = None, cache: Optional[SummaryCache] = None):
+        self.transport = transport  # Required by summarize_async
+        self.streaming = streaming
+        self.token_budget = token_budget  # None falls back to a plain MAX_CONTENT_LENGTH cut
         self.providers = ['deepseek', 'openai']
         self.models = {
             'deepseek': 'deepseek-chat',
             'openai': 'gpt-4o'
         }
+        self.hedge_delay = hedge_delay  # None tries providers strictly one after another
+        self.latency_budget = latency_budget
+        self.cache = cache or default_summary_cache()
 
-    def summarize(self, text: str) -> Dict[str, Any]:
-        """Generates summary using available AI providers with fallback"""
-        text = self._preprocess_content(text)
-        
-        for provider in self.providers:
-            result = self._try_provider(provider, text)
-            if result.get('summary'):
-                result['summary'] = self._strip_meta_preamble(result['summary'])
-                return result
-        
-        return {'summary': '', 'ai': 'none', 'model': 'none', 'tokens_used': 0}
+    def _cached(self, text: str, event: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Earlier summary of the same source and prompts, preferring the primary provider's model"""
+        if not self.cache:
+            return None
+        subject = (event or {}).get('subject', '')
+        result = self.cache.get(subject, text, PROMPT_VERSION, [self.models[p] for p in self.providers])
+        if result:
+            logging.info(f"Summary cache hit for {subject or 'source'}: {result['tokens_used']} tokens saved")
+            telemetry.count('tokens_saved', result['tokens_used'])
+            result.update(tokens_used=0, cached=True)
+        return result
 
-    def _try_provider(self, provider: str, text: str) -> Dict[str, Any]:
-        """Attempt summary generation with a specific provider"""
+    def _finish(self, text: str, event: Optional[Dict[str, Any]], result: Dict[str, Any]) -> Dict[str, Any]:
+        result['summary'] = self._strip_meta_preamble(result['summary'])
+        if self.cache:
+            try:
+                self.cache.put((event or {}).get('subject', ''), text, PROMPT_VERSION, result)
+            except OSError as e:
+                logging.warning(f"Could not cache summary: {str(e)}")
+        return result
+
+    def _provider_order(self) -> List[str]:
+        """Providers in preference order; those whose circuit is open go last, so the fallback is tried first"""
+        tripped = [p for p in self.providers if rate_limiter.host(AI_BASE_URLS[p]).state == 'open']
+        if tripped:
+            logging.warning(f"Circuit open for {', '.join(tripped)}; trying the other providers first")
+        return [p for p in self.providers if p not in tripped] + tripped
+
+    def _build_request(self, provider: str, text: str) -> Optional[Tuple[str, Dict[str, str], Dict[str, Any]]]:
+        """URL, headers and payload of a chat completion, or None without an API key"""
         api_key = os.getenv(f'{provider.upper()}_API_KEY')
         if not api_key:
             logging.warning(f"Missing API key for {provider}")
-            return {}
+            return None
 
-        base_url = "https://api.deepseek.com" if provider == 'deepseek' else "https://api.openai.com"
-        url = f"{base_url}/v1/chat/completions"
+        url = f"{AI_BASE_URLS[provider]}/v1/chat/completions"
         
-        system = (
-            'אתה כותב את גוף הטקסט (בעברית בלבד) לפוסט בערוץ טלגרם של "קדמא" '
-            'על דמות או אירוע מההיסטוריה היהודית.\n'
-            'מטרה: פוסט מעניין, מהותי ומדויק היסטורית — לא תקציר יבש ולא רשימת תאריכים.\n\n'
-            'מבנה ואורך:\n'
-            '- 3 עד 5 פסקאות קצרות, סך הכל כ־700–1100 תווים (בערך 120–200 מילים).\n'
-            '- פתיחה עם וו (Hook) קצר שמסביר למה הדמות/האירוע משמעותיים.\n'
-            '- אחר כך רקע היסטורי, פועלו/משמעותו, והשפעה לדורות.\n'
-            '- סיום עם משפט תובנה או הקשר רחב יותר.\n\n'
-            'סגנון:\n'
-            '- עברית תקנית, זורמת, בגובה העיניים — לא מליצית ולא ויקיפדית.\n'
-            '- הדגש שמות, מקומות, ספרים ותאריכי מפתח עם **bold** של Markdown.\n'
-            '- אפשר 1–3 אימוג׳ים עדינים ורלוונטיים (למשל 🕯️📜✡️📚), לא יותר.\n'
-            '- שלב פרטים קונקרטיים מהמקור (שמות חיבורים, תלמידים, ערים, שנים) — לא הכללות.\n\n'
-            'איסורים:\n'
-            '- אל תכתוב שורה שמתארת את המשימה (כמו "הנה פוסט", "פוסט היסטורי", "להלן", '
-            '"זהו פוסט", "קצר ומדויק לטלגרם") ואל תוסיף הקדמות באנגלית.\n'
-            '- אל תוסיף קווים מפרידים (---), כותרות סעיפים, או שורת תאריך/כותרת — '
-            'הן מתווספות אוטומטית מסביב לטקסט שלך.\n'
-            '- אל תמציא עובדות שלא מופיעות במקור; אם פרט לא ברור, השמט אותו.\n'
-            '- אל תתחיל ב"ביום זה" או ב"היום" — תאריך כבר מופיע מעל הפוסט.'
-        )
-        user = (
-            'הטקסט הבא הוא תקציר ויקיפדיה על נושא הפוסט. כתוב על בסיסו את גוף הפוסט בלבד, '
-            'לפי ההנחיות שבמערכת. החזר רק את גוף הפוסט — בלי הקדמה, בלי הסבר, בלי כותרת.\n\n'
-            'מקור:\n"""\n'
-            + text[:MAX_CONTENT_LENGTH]
-            + '\n"""'
-        )
+        user = USER_PROMPT_PREFIX + text + '\n"""'
         payload = {
             'model': self.models[provider],
             'messages': [
-                {'role': 'system', 'content': system},
+                {'role': 'system', 'content': SYSTEM_PROMPT},
                 {'role': 'user', 'content': user},
             ],
             'temperature': 0.6,
             'max_tokens': 900,
         }
+        if self.streaming:
+            payload.update({'stream': True, 'stream_options': {'include_usage': True}})
+        return url, {'Authorization': f'Bearer {api_key}'}, payload
 
-        last_error: Optional[Exception] = None
-        for attempt in range(1, AI_RETRY_ATTEMPTS + 1):
-            try:
-                response = self.http.post(
-                    url,
-                    headers={'Authorization': f'Bearer {api_key}'},
-                    json=payload,
-                    timeout=API_TIMEOUT
-                )
-                response.raise_for_status()
-                data = response.json()
-
-                return {
-                    'summary': data['choices'][0]['message']['content'],
-                    'ai': provider,
-                    'model': self.models[provider],
-                    'tokens_used': data.get('usage', {}).get('total_tokens', 0)
-                }
-            except Exception as e:
-                last_error = e
-                status = getattr(getattr(e, 'response', None), 'status_code', None)
-                transient = status is None or status >= 500 or status == 429
-                logging.warning(
-                    f"{provider.capitalize()} API failed (attempt {attempt}/{AI_RETRY_ATTEMPTS}, "
-                    f"status={status}): {str(e)}"
-                )
-                if not transient or attempt == AI_RETRY_ATTEMPTS:
+    def _parse_completion(self, provider: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            'summary': data['choices'][0]['message']['content'],
+            'ai': provider,
+            'model': self.models[provider],
+            'tokens_used': data.get('usage', {}).get('total_tokens', 0)
+        }
+
+    def _is_transient_failure(self, provider: str, attempt: int, e: Exception) -> bool:
+        """Log a failed attempt; True when it is worth retrying"""
+        if isinstance(e, CircuitOpen):
+            logging.warning(f"{provider.capitalize()} skipped: {str(e)}")
+            return False
+        status = getattr(getattr(e, 'response', None), 'status_code', None)
+        logging.warning(
+            f"{provider.capitalize()} API failed (attempt {attempt}/{AI_RETRY_ATTEMPTS}, "
+            f"status={status}): {str(e)}"
+        )
+        return is_transient(status)
+
+    def _retry_delay(self, url: str, attempt: int) -> float:
+        """Jittered backoff, or longer while the host has asked us to wait (Retry-After)"""
+        host = rate_limiter.host(url)
+        if host.state == 'open':
+            return 0.0  # The next attempt fails fast with CircuitOpen
+        return max(backoff_delay(attempt, AI_RETRY_BACKOFF), host.blocked_for())
+
+    async def summarize_async(self, text: str, event: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Generates a summary with the available AI providers over the shared
+        transport: cached summaries are reused, and the fallback provider is
+        raced against a slow primary (see _summarize_hedged_async).
+        """
+        text = self._compact(self._preprocess_content(text), event)
+        cached = self._cached(text, event)
+        if cached:
+            return cached
+        result = await self._summarize_hedged_async(text)
+        if result.get('summary'):
+            return self._finish(text, event, result)
+        return {'summary': '', 'ai': 'none', 'model': 'none', 'tokens_used': 0}
+
+    async def _summarize_hedged_async(self, text: str) -> Dict[str, Any]:
+        start = time.monotonic()
+        deadline = start + self.latency_budget
+        hedge_delay = self.hedge_delay if self.hedge_delay is not None else float('inf')
+        tasks: Dict[asyncio.Task, str] = {}
+        started: Dict[str, float] = {}
+        waiting = self._provider_order()
+
+        def launch() -> None:
+            provider = waiting.pop(0)
+            started[provider] = time.monotonic()
+            if tasks:
+                logging.info(f"Hedging: starting {provider} after {started[provider] - start:.1f}s")
+            tasks[asyncio.create_task(self._try_provider_async(provider, text))] = provider
+
+        launch()
+        try:
+            while tasks or waiting:
+                now = time.monotonic()
+                if now >= deadline:
+                    logging.warning(f"AI latency budget of {self.latency_budget:g}s exhausted")
                     break
-                time.sleep(AI_RETRY_BACKOFF ** attempt)
+                if waiting and (not tasks or now >= max(started.values()) + hedge_delay):
+                    launch()
+                    continue
+
+                timeout = deadline - now
+                if waiting:
+                    timeout = min(timeout, max(started.values()) + hedge_delay - now)
+                done, _ = await asyncio.wait(tasks, timeout=max(timeout, 0), return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    provider = tasks.pop(task)
+                    result = task.result() if not task.exception() else {}
+                    if result.get('summary'):
+                        still_running = {p: started[p] for p in tasks.values()}
+                        return self._record_winner(result, provider, start, started, still_running)
+        finally:
+            for task in tasks:
+                task.cancel()
 
-        logging.warning(f"{provider.capitalize()} giving up: {last_error}")
         return {}
 
+    def _record_winner(self, result: Dict[str, Any], provider: str, start: float,
+                       started: Dict[str, float], running: Dict[str, float]) -> Dict[str, Any]:
+        """Attach and log hedging details; `running` maps still-running providers to their start times"""
+        finished = time.monotonic()
+        losers = {p: finished - t for p, t in running.items()}
+        result['hedge'] = {
+            'winner': provider,
+            'hedged': bool(losers),
+            'latency': round(finished - start, 3),
+            # How long each cancelled provider had been running without an answer
+            'losers': {p: round(t, 3) for p, t in losers.items()},
+        }
+        logging.info(
+            f"{provider.capitalize()} answered in {finished - started[provider]:.1f}s"
+            + ''.join(f"; {p} cancelled after {t:.1f}s" for p, t in losers.items())
+        )
+        return result
+
+    async def _try_provider_async(self, provider: str, text: str) -> Dict[str, Any]:
+        if self.transport is None:
+            raise ValueError("summarize_async needs an AsyncTransport")
+        with telemetry.span(f'ai.{provider}'):
+            request = self._build_request(provider, text)
+            if not request:
+                return {}
+            url, headers, payload = request
+
+            last_error: Optional[Exception] = None
+            for attempt in range(1, AI_RETRY_ATTEMPTS + 1):
+                try:
+                    if self.streaming:
+                        stream = CompletionStream(self, provider)
+                        async with self.transport.stream('POST', url, headers=headers, json=payload) as response:
+                            response.raise_for_status()
+                            async for line in response.aiter_lines():
+                                if stream.feed(line):
+                                    break
+                            telemetry.count('bytes', response.num_bytes_downloaded)
+                        result = stream.result()
+                    else:
+                        # Retries stay with the loop below so they share AI_RETRY_ATTEMPTS
+                        response = await self.transport.request('POST', url, headers=headers, json=payload, retries=0)
+                        telemetry.count('bytes', len(response.content))
+                        response.raise_for_status()
+                        result = self._parse_completion(provider, response.json())
+                    telemetry.count('tokens', result.get('tokens_used', 0))
+                    return result
+                except Exception as e:
+                    last_error = e
+                    if not self._is_transient_failure(provider, attempt, e) or attempt == AI_RETRY_ATTEMPTS:
+                        break
+                    telemetry.count('retries')
+                    await asyncio.sleep(self._retry_delay(url, attempt))
+
+            logging.warning(f"{provider.capitalize()} giving up: {last_error}")
+            return {}
+
+    def _is_english(self, line: str) -> bool:
+        """
+        True when an opening line is an English preamble: a stock opener
+        ("Sure", "Here is ..."), or Latin text without a single Hebrew letter.
+        Hebrew lines with English names or transliterations pass.
+        """
+        if re.match(r"^\W*(?:sure|certainly|of course|okay|here(?:'s|\s+is|\s+are)|below\s+is)\b", line, re.IGNORECASE):
+            return True
+        return bool(re.search(r'[A-Za-z]', line)) and not re.search(r'[\u05d0-\u05ea]', line)
+
+    def _compact(self, text: str, event: Optional[Dict[str, Any]]) -> str:
+        """Fit the source into the input token budget, logging the estimate before and after"""
+        if self.token_budget is None:
+            return text[:MAX_CONTENT_LENGTH]
+        before = estimate_tokens(text)
+        text = compact_source(text, event, self.token_budget)
+        after = estimate_tokens(text)
+        logging.info(
+            f"Source compacted: ~{before} -> ~{after} tokens "
+            f"(prompt ~{estimate_tokens(SYSTEM_PROMPT) + estimate_tokens(USER_PROMPT_PREFIX) + after} tokens)"
+        )
+        return text
+
     def _preprocess_content(self, text: str) -> str:
         """Clean and format content before sending to AI"""
         text = re.sub(r'\s+', ' ', text)  # Remove extra whitespace
@@ -239,9 +845,9 @@ class AIClient:
         t = re.sub(r'^(?:[-─–_•]\s*){3,}\s*\n+', '', t)
         return t.strip()
 
-def validate_environment() -> bool:
+def validate_environment(required: Optional[List[str]] = None) -> bool:
     """Check required environment variables"""
-    required = ['TELEGRAM_BOT_TOKEN', 'DEEPSEEK_API_KEY', 'OPENAI_API_KEY']
+    required = required or ['TELEGRAM_BOT_TOKEN', 'DEEPSEEK_API_KEY', 'OPENAI_API_KEY']
     missing = [var for var in required if not os.getenv(var)]
     
     if missing:
@@ -249,16 +855,6 @@ def validate_environment() -> bool:
         return False
     return True
 
-def get_hebrew_date(today: datetime) -> tuple[str, str]:
-    """Returns today's Hebrew date components"""
-    _, heb_month, heb_day = hebrew.from_gregorian(today.year, today.month, today.day)
-    months = ['ניסן', 'אייר', 'סיוון', 'תמוז', 'אב', 'אלול',
-             'תשרי', 'חשוון', 'כסלו', 'טבת', 'שבט', 'אדר']
-    days = ['א', 'ב', 'ג', 'ד', 'ה', 'ו', 'ז', 'ח', 'ט', 'י', 
-           'יא', 'יב', 'יג', 'יד', 'טו', 'טז', 'יז', 'יח', 'יט', 
-           'כ', 'כא', 'כב', 'כג', 'כד', 'כה', 'כו', 'כז', 'כח', 'כט', 'ל']
-    return days[heb_day - 1], months[heb_month - 1]
-
 def load_events(filename: str = HEBREW_EVENTS_FILE) -> List[Dict[str, Any]]:
     """Load historical events from JSON file"""
     try:
@@ -268,14 +864,60 @@ def load_events(filename: str = HEBREW_EVENTS_FILE) -> List[Dict[str, Any]]:
         logging.error(f"Failed to load events: {str(e)}")
         return []
 
-def select_event(events: List[Dict[str, Any]], day: str, month: str) -> Optional[Dict[str, Any]]:
-    """Select random event matching date"""
-    candidates = [e for e in events if e['day'] == day and e['month'] == month]
-    return random.choice(candidates) if candidates else None
+def load_event_store(filename: str = EVENT_STORE_FILE, source: str = HEBREW_EVENTS_FILE) -> Optional[EventStore]:
+    """Open the compiled event store, or None if it is missing or out of date"""
+    try:
+        store = EventStore(filename)
+    except (OSError, ValueError) as e:
+        logging.warning(f"Compiled event store unavailable: {str(e)}")
+        return None
+    if store.is_stale(source):
+        logging.warning(f"{filename} was built from a different {source}; run EventStore.py to rebuild it")
+        store.close()
+        return None
+    return store
+
+def load_event_database(filename: Optional[str] = None, source: str = HEBREW_EVENTS_FILE) -> Optional['EventDatabase']:
+    """Open the SQLite archive if it has been built and is up to date (it is optional)"""
+    from EventDatabase import EventDatabase, EVENT_DB_FILE
+
+    filename = filename or EVENT_DB_FILE
+    if not os.path.exists(filename):
+        return None
+    try:
+        db = EventDatabase(filename)
+    except (OSError, ValueError) as e:
+        logging.warning(f"Event database unavailable: {str(e)}")
+        return None
+    if db.is_stale(source):
+        logging.warning(f"{filename} was built from a different {source}; run EventDatabase.py build to rebuild it")
+        db.close()
+        return None
+    return db
+
+def open_archive():
+    """Best available event source: SQLite database, compiled store, then the JSON file"""
+    return load_event_database() or load_event_store() or load_events()
 
-def select_fallback_event(events: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
-    """Pick any event from the archive when today's date has no match."""
-    return random.choice(events) if events else None
+def check_archive_links(events: List[Dict[str, Any]], wiki: Optional[WikipediaClient] = None) -> Dict[str, Dict[str, Any]]:
+    """Resolve every subject_url in the archive and log dead and redirected links"""
+    wiki = wiki or WikipediaClient()
+    titles = {e['subject_url']: title_from_url(e['subject_url']) for e in events}
+    pages = wiki.fetch_pages(list(titles.values()), extracts=False)
+    report = {url: pages[title] for url, title in titles.items()}
+
+    counts: Dict[str, int] = {}
+    for url, page in report.items():
+        counts[page['status']] = counts.get(page['status'], 0) + 1
+        if page['status'] == 'redirect':
+            logging.info(f"Redirect: {url} -> {page['title']}")
+        elif page['status'] != 'ok':
+            logging.warning(f"{page['status'].capitalize()}: {url}")
+    logging.info(
+        f"Checked {len(report)} links in {wiki.api_requests} API requests: "
+        + ', '.join(f"{k}={v}" for k, v in sorted(counts.items()))
+    )
+    return report
 
 def format_post(event: Dict[str, Any], day: str, month: str, summary: str, from_archive: bool = False) -> str:
     """Format final Telegram post"""
@@ -291,63 +933,521 @@ def format_post(event: Dict[str, Any], day: str, month: str, summary: str, from_
         "_בוט ה AI של קדמא_"
     )
 
-def run() -> None:
-    if not validate_environment():
+def plan_posts(events, dates: List[datetime], ledger) -> List[Dict[str, Any]]:
+    """
+    Event for each date through the rotation ledger (see Planner.plan_schedule).
+    The picks are only kept in memory; record_picks() saves them once the
+    posts have been generated.
+    """
+    from Planner import plan_schedule
+
+    with telemetry.span('select_event'):
+        schedule = plan_schedule(events, dates, ledger)
+    for planned in schedule:
+        if planned['from_archive']:
+            logging.warning(
+                f"No events for {planned['hebrew_day']} {planned['hebrew_month']}; falling back to archive."
+            )
+        if not planned['event']:
+            logging.error("Archive is empty; cannot pick fallback event")
+    return [planned for planned in schedule if planned['event']]
+
+def record_picks(ledger, schedule: List[Dict[str, Any]], queue: PostQueue) -> None:
+    """Save the picks of the planned dates whose post is queued; the rest get their event back"""
+    for planned in schedule:
+        if planned['date'] not in queue:
+            ledger.release(planned)
+    ledger.save()
+
+def _post_entry(planned: Dict[str, Any], summary: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Queue entry for a finished summary; None if summarizing failed"""
+    if not summary.get('summary'):
+        logging.error("Failed to generate AI summary (all providers exhausted)")
+        return None
+    source = " (cached)" if summary.get('cached') else ""
+    logging.info(f"Summary by {summary['ai']}/{summary['model']}{source}: {summary['tokens_used']} tokens used")
+
+    event, day, month = planned['event'], planned['hebrew_day'], planned['hebrew_month']
+    return {
+        'date': PostQueue.key(planned['date']),
+        'hebrew_date': planned['hebrew_date'],
+        'hebrew_day': day,
+        'hebrew_month': month,
+        'event': event,
+        'from_archive': planned['from_archive'],
+        'post': format_post(event, day, month, summary['summary'], planned['from_archive']),
+        'ai': summary['ai'],
+        'model': summary['model'],
+        'tokens_used': summary['tokens_used'],
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+    }
+
+async def generate_post_async(planned: Dict[str, Any], wiki: WikipediaClient, ai: AIClient) -> Optional[Dict[str, Any]]:
+    """Fetch, summarize and format the post for a planned date (see plan_posts); None if any stage fails"""
+    event = planned['event']
+    with telemetry.span('fetch_content'):
+        content = await wiki.fetch_content_async(event['subject_url'])
+    if not content:
+        logging.error(f"Wikipedia returned empty content for {event['subject_url']}")
+        return None
+
+    with telemetry.span('summarize'):
+        summary = await ai.summarize_async(content, event)
+    return _post_entry(planned, summary)
+
+def pregenerate(days: int = PREGENERATE_DAYS, workers: int = PREGENERATE_WORKERS,
+                start: Optional[datetime] = None, queue: Optional[PostQueue] = None) -> int:
+    """
+    Generate posts for the `days` dates after `start` concurrently and queue
+    them, skipping Shabbat like the publish schedule; returns how many were
+    queued. Exits with status 1 when dates were due but none could be
+    queued. Today is left out: its post has already gone out when the
+    evening workflow runs.
+    """
+    if not validate_environment(['DEEPSEEK_API_KEY', 'OPENAI_API_KEY']):
         sys.exit(1)
 
-    date = datetime.now()
-    hebrew_day, hebrew_month = get_hebrew_date(date)
+    queue = queue or PostQueue()
+    start = start or datetime.now()
+    pruned = queue.prune(start)
+    if pruned:
+        logging.info(f"Dropped {pruned} queued posts for past dates")
 
-    events = load_events()
+    dates = [start + timedelta(days=i) for i in range(1, days + 1)]
+    dates = [d for d in dates if d.weekday() not in DAEMON_SKIP_WEEKDAYS and d not in queue]
+    if not dates:
+        logging.info(f"Queue already covers the next {days} days")
+        return 0
+
+    events = open_archive()
     if not events:
         logging.error("No events loaded from data file")
         sys.exit(1)
 
-    from_archive = False
-    event = select_event(events, hebrew_day, hebrew_month)
-    if not event:
-        logging.warning(
-            f"No events for {hebrew_day} {hebrew_month}; falling back to archive."
-        )
-        event = select_fallback_event(events)
-        from_archive = True
-        if not event:
-            logging.error("Archive is empty; cannot pick fallback event")
-            sys.exit(1)
+    from Planner import RotationLedger
 
-    wiki = WikipediaClient()
-    content = wiki.fetch_content(event['subject_url'])
-    if not content:
-        logging.error(f"Wikipedia returned empty content for {event['subject_url']}")
+    ledger = RotationLedger()
+    schedule = plan_posts(events, dates, ledger)
+    queued = asyncio.run(_pregenerate_async(schedule, workers, queue))
+    record_picks(ledger, schedule, queue)
+    logging.info(f"Pre-generated {queued}/{len(dates)} posts; pending: {', '.join(queue.pending())}")
+    if not queued:
         sys.exit(1)
+    return queued
 
-    ai = AIClient()
-    summary = ai.summarize(content)
-    if not summary.get('summary'):
-        logging.error("Failed to generate AI summary (all providers exhausted)")
-        sys.exit(1)
+async def _pregenerate_async(schedule: List[Dict[str, Any]], workers: int, queue: PostQueue) -> int:
+    """All dates in one event loop, sharing one pooled transport"""
+    async with AsyncTransport() as transport:
+        wiki = WikipediaClient(transport=transport)
+        ai = AIClient(transport=transport)
+        queued = await fill_queue(schedule, queue, wiki, ai, workers)
+    if wiki.cache:
+        wiki.cache.log_stats()
+    if ai.cache:
+        ai.cache.log_stats()
+    return queued
+
+async def fill_queue(schedule: List[Dict[str, Any]], queue: PostQueue, wiki: WikipediaClient, ai: AIClient,
+                     workers: int = PREGENERATE_WORKERS) -> int:
+    """Generate and queue the planned posts with at most `workers` in flight; returns how many were queued"""
+    limit = asyncio.Semaphore(workers)
+    queued = 0
+
+    async def generate(planned: Dict[str, Any]) -> None:
+        nonlocal queued
+        async with limit:
+            try:
+                entry = await generate_post_async(planned, wiki, ai)
+                if not entry:
+                    return
+                queue.put(planned['date'], entry)
+            except Exception as e:
+                logging.error(f"Pre-generation failed for {PostQueue.key(planned['date'])}: {str(e)}")
+                return
+        queued += 1
+        logging.info(f"Queued post for {entry['date']} ({entry['hebrew_day']} {entry['hebrew_month']})")
+
+    await asyncio.gather(*(generate(planned) for planned in schedule))
+    return queued
 
-    post = format_post(event, hebrew_day, hebrew_month, summary['summary'], from_archive)
+async def publish(variants: Dict[str, str], destinations: List[Dict[str, Any]],
+                  transport: Optional[AsyncTransport] = None) -> Dict[str, Dict[str, Any]]:
+    """Fan a post out to every destination; returns the per-chat delivery report"""
+    if transport is None:
+        async with AsyncTransport() as transport:
+            return await publish(variants, destinations, transport)
+    bot = TelegramBot(os.getenv('TELEGRAM_BOT_TOKEN'), transport=transport)
+    return await FanOutPublisher(bot).publish(variants, destinations)
 
-    with open('post.md', 'w', encoding='utf-8') as f:
-        f.write(post)
+def run() -> None:
+    date = datetime.now()
+    queue = PostQueue()
+    with telemetry.span('dequeue'):
+        entry = queue.get(date)
+
+    planned = None
+    if entry:
+        logging.info(f"Publishing pre-generated post for {entry['date']}")
+        if not validate_environment(['TELEGRAM_BOT_TOKEN']):
+            sys.exit(1)
+    else:
+        logging.info("No pre-generated post queued for today; generating live")
+        if not validate_environment():
+            sys.exit(1)
 
-    bot = TelegramBot(os.getenv('TELEGRAM_BOT_TOKEN'))
-    result = bot.send_message(TELEGRAM_CHANNEL, post)
-    if not result.get('ok'):
-        logging.error(f"Failed to publish post to Telegram: {result}")
+        with telemetry.span('load_events'):
+            events = open_archive()
+        if not events:
+            logging.error("No events loaded from data file")
+            sys.exit(1)
+
+        from Planner import RotationLedger
+
+        ledger = RotationLedger()
+        schedule = plan_posts(events, [date], ledger)
+        if not schedule:
+            sys.exit(1)
+        planned = schedule[0]
+
+    entry = asyncio.run(_post_today(entry, planned, queue))
+    if planned:
+        # Kept when only publishing failed: the retry sends the queued post
+        record_picks(ledger, [planned], queue)
+    if not entry:
         sys.exit(1)
+    # Ack on partial delivery too: publishing again would repeat the post in the chats that got it
+    queue.ack(date)
 
     logging.info(
-        f"Post published successfully (archive={from_archive}, "
-        f"ai={summary['ai']}, model={summary['model']})"
+        f"Post published successfully (archive={entry['from_archive']}, "
+        f"ai={entry['ai']}, model={entry['model']})"
     )
 
+async def _post_today(entry: Optional[Dict[str, Any]], planned: Optional[Dict[str, Any]],
+                      queue: PostQueue) -> Optional[Dict[str, Any]]:
+    """
+    Generate the planned post when nothing was queued, then publish it, all
+    over one pooled transport. Returns the published entry, or None if
+    generation failed or no destination got the post.
+    """
+    async with AsyncTransport() as transport:
+        if entry is None:
+            wiki = WikipediaClient(transport=transport)
+            ai = AIClient(transport=transport)
+            entry = await generate_post_async(planned, wiki, ai)
+            if wiki.cache:
+                wiki.cache.log_stats()
+            if ai.cache:
+                ai.cache.log_stats()
+            if not entry:
+                return None
+            queue_live_post(queue, planned['date'], entry)
+
+        with open('post.md', 'w', encoding='utf-8') as f:
+            f.write(entry['post'])
+
+        destinations = load_destinations(default_chat=TELEGRAM_CHANNEL)
+        with telemetry.span('publish'):
+            report = await publish(entry_variants(entry), destinations, transport)
+    return entry if delivered(report) else None
+
+def queue_live_post(queue: PostQueue, date: datetime, entry: Dict[str, Any]) -> None:
+    """
+    Queue a post generated at publish time before sending it, so a retry
+    after a failed delivery publishes the same event and summary instead of
+    planning and paying for another one.
+    """
+    try:
+        queue.put(date, entry)
+    except OSError as e:
+        logging.warning(f"Could not queue the generated post: {str(e)}")
+
+def entry_variants(entry: Dict[str, Any]) -> Dict[str, str]:
+    """Post text per language for a queue entry; the Hebrew post is the default"""
+    return {DEFAULT_LANGUAGE: entry['post'], **entry.get('variants', {})}
+
+def delivered(report: Dict[str, Dict[str, Any]]) -> bool:
+    """Log a delivery report; True if at least one destination got the post"""
+    ok = [chat for chat, r in report.items() if r['ok']]
+    logging.info(f"Delivered to {len(ok)}/{len(report)} destinations")
+    if not ok:
+        logging.error(f"Failed to publish post to Telegram: {report}")
+    return bool(ok)
+
+
+def hebrew_date_key(date: datetime) -> str:
+    """Hebrew calendar date as YYYY-MM-DD (convertdate month numbering)"""
+    from HebrewCalendar import hebrew_day
+
+    return hebrew_day(date).key
+
+
+class Daemon:
+    """
+    Resident bot: posts once per Hebrew date at DAEMON_POST_TIME (skipping
+    Shabbat, like the workflow schedule), then tops up the pre-generated
+    queue. The event index, HTTP connection pools and caches stay warm
+    between posts, and hebrew_events.json is re-indexed when it changes.
+    """
+    def __init__(self, post_time: str = DAEMON_POST_TIME, pregenerate_days: int = PREGENERATE_DAYS,
+                 workers: int = PREGENERATE_WORKERS, state_file: str = DAEMON_STATE_FILE):
+        hour, minute = map(int, post_time.split(':'))
+        self.post_time = (hour, minute)
+        self.pregenerate_days = pregenerate_days
+        self.workers = workers
+        self.state_file = state_file
+        self.tz = ZoneInfo(DAEMON_TIMEZONE)
+        self.events = EventIndex()
+        self.queue = PostQueue()
+        self.retry_at: Optional[datetime] = None
+        self.retry_day: Optional[datetime] = None  # Start of the day whose post failed
+        self.state = self._load_state()
+
+    def _load_state(self) -> Dict[str, Any]:
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self) -> None:
+        tmp = f"{self.state_file}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, ensure_ascii=False, indent=4)
+        os.replace(tmp, self.state_file)
+
+    def next_post_at(self, now: datetime) -> datetime:
+        """When the next post is due: a pending retry, today's slot, or the next non-Shabbat day's"""
+        day = now
+        if self.retry_at:
+            if self.retry_at.date() == self.retry_day.date() and self.retry_at.weekday() not in DAEMON_SKIP_WEEKDAYS:
+                return self.retry_at
+            # A retry past the end of the failed day would post at night, or on Shabbat; give that day up
+            day = max(now, self.retry_day + timedelta(days=1))
+            self.retry_at = self.retry_day = None
+        while True:
+            slot = day.replace(hour=self.post_time[0], minute=self.post_time[1], second=0, microsecond=0)
+            if day.weekday() not in DAEMON_SKIP_WEEKDAYS and hebrew_date_key(day) != self.state.get('last_posted'):
+                return max(slot, now)
+            day = slot + timedelta(days=1)
+
+    def _schedule_retry(self, now: datetime) -> datetime:
+        """Retry the post that failed at `now` after DAEMON_RETRY_DELAY (see next_post_at)"""
+        self.retry_at = now + timedelta(seconds=DAEMON_RETRY_DELAY)
+        self.retry_day = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        return self.retry_at
+
+    def _reload_events(self) -> None:
+        changes = self.events.reload()
+        if changes and any(changes.values()):
+            logging.info(
+                f"Re-indexed {self.events.source}: {len(self.events)} events, {changes['added']} dates added, "
+                f"{changes['changed']} changed, {changes['removed']} removed"
+            )
+
+    async def serve(self) -> None:
+        if not validate_environment():
+            sys.exit(1)
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+
+        async with AsyncTransport() as transport:
+            self.wiki = WikipediaClient(transport=transport)
+            self.ai = AIClient(transport=transport)
+            self.publisher = FanOutPublisher(TelegramBot(os.getenv('TELEGRAM_BOT_TOKEN'), transport=transport))
+            logging.info(f"Daemon started with {len(self.events)} events")
+
+            while not stop.is_set():
+                now = datetime.now(self.tz)
+                try:
+                    self._reload_events()
+                    due = self.next_post_at(now)
+                    if due <= now:
+                        await self.post(now)
+                        continue
+                except Exception as e:
+                    # Keep serving; the post is retried like any failed one
+                    due = self._schedule_retry(now)
+                    logging.error(f"Daemon iteration failed: {e!r}; retrying at {due.strftime('%H:%M')}")
+                try:
+                    # Wake up at least every poll interval to notice archive changes
+                    await asyncio.wait_for(stop.wait(), min((due - now).total_seconds(), DAEMON_POLL_SECONDS))
+                except asyncio.TimeoutError:
+                    pass
+        logging.info("Daemon stopped")
+
+    async def post(self, now: datetime) -> bool:
+        """Publish today's post; on failure retry after DAEMON_RETRY_DELAY"""
+        if hebrew_date_key(now) == self.state.get('last_posted'):
+            self.retry_at = self.retry_day = None  # Posted already; a retry scheduled after a later error is moot
+            return True
+        telemetry.reset()
+        try:
+            ok = await self._post(now)
+        except Exception as e:
+            logging.error(f"Post failed: {e!r}")
+            ok = False
+        write_run_report()
+        if not ok:
+            logging.warning(f"Post failed; retrying at {self._schedule_retry(now).strftime('%H:%M')}")
+            return False
+
+        self.retry_at = self.retry_day = None
+        self.state = {'last_posted': hebrew_date_key(now), 'posted_at': now.isoformat(timespec='seconds')}
+        try:
+            self._save_state()
+        except OSError as e:
+            logging.error(f"Could not save {self.state_file}: {str(e)}")
+        try:
+            await self.top_up(now)
+        except Exception as e:
+            logging.error(f"Pre-generation failed: {e!r}")
+        return True
+
+    async def _post(self, now: datetime) -> bool:
+        with telemetry.span('dequeue'):
+            entry = self.queue.get(now)
+        if not entry:
+            logging.info("No pre-generated post queued for today; generating live")
+            from Planner import RotationLedger
+
+            ledger = RotationLedger()
+            schedule = plan_posts(self.events, [now], ledger)
+            if not schedule:
+                return False
+            entry = await generate_post_async(schedule[0], self.wiki, self.ai)
+            if entry:
+                queue_live_post(self.queue, now, entry)
+            record_picks(ledger, schedule, self.queue)
+            if not entry:
+                return False
+
+        with open('post.md', 'w', encoding='utf-8') as f:
+            f.write(entry['post'])
+        destinations = load_destinations(default_chat=TELEGRAM_CHANNEL)
+        with telemetry.span('publish'):
+            report = await self.publisher.publish(entry_variants(entry), destinations)
+        if not delivered(report):
+            return False
+        try:
+            self.queue.ack(now)
+        except OSError as e:
+            logging.error(f"Could not remove the published post from the queue: {str(e)}")
+        return True
+
+    async def top_up(self, now: datetime) -> None:
+        """Pre-generate the coming days' posts while the clients are warm"""
+        self.queue.prune(now)
+        dates = [now + timedelta(days=i) for i in range(1, self.pregenerate_days + 1)]
+        dates = [d for d in dates if d.weekday() not in DAEMON_SKIP_WEEKDAYS and d not in self.queue]
+        if dates:
+            from Planner import RotationLedger
+
+            ledger = RotationLedger()
+            schedule = plan_posts(self.events, dates, ledger)
+            queued = await fill_queue(schedule, self.queue, self.wiki, self.ai, self.workers)
+            record_picks(ledger, schedule, self.queue)
+            logging.info(f"Pre-generated {queued}/{len(dates)} posts")
+
+def print_plan(days: int = PLAN_DAYS, start: Optional[datetime] = None) -> None:
+    """Print the rotation schedule for the coming days without recording it in the ledger"""
+    from Planner import plan_schedule, RotationLedger
+
+    start = start or datetime.now()
+    events = open_archive()
+    began = time.perf_counter()
+    schedule = plan_schedule(events, [start + timedelta(days=i) for i in range(days)], RotationLedger().preview())
+    elapsed = time.perf_counter() - began
+    for planned in schedule:
+        event = planned['event'] or {}
+        marker = ' (archive)' if planned['from_archive'] else ''
+        print(f"{PostQueue.key(planned['date'])}  {planned['hebrew_day']} {planned['hebrew_month']}  "
+              f"{event.get('subject', '-')}{marker}")
+    logging.info(f"Planned {len(schedule)} days in {elapsed * 1000:.1f} ms")
+
+def write_run_report() -> None:
+    """Write the JSON run report and the Markdown table for the job summary"""
+    cache = None
+    if 'HttpCache' in sys.modules:  # Nothing was fetched over requests otherwise
+        cache = sys.modules['HttpCache'].default_http_cache()
+    if cache:
+        for key, value in cache.stats.items():
+            telemetry.counters[f'http_cache.{key}'] = value
+    rate_limiter.record_metrics()
+    summaries = default_summary_cache()
+    if summaries and any(summaries.stats.values()):
+        for key, value in summaries.stats.items():
+            telemetry.counters[f'summary_cache.{key}'] = value
+    try:
+        telemetry.write_json(RUN_REPORT_JSON)
+        telemetry.write_markdown(RUN_REPORT_MD)
+    except OSError as e:
+        logging.warning(f"Could not write run report: {str(e)}")
+
+def profiled(fn) -> None:
+    """Run fn under cProfile and tracemalloc, dumping both next to the run report"""
+    import cProfile
+    import pstats
+    import tracemalloc
+
+    tracemalloc.start(10)
+    profiler = cProfile.Profile()
+    try:
+        profiler.runcall(fn)
+    finally:
+        profiler.dump_stats(PROFILE_FILE)
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        with open(PROFILE_SUMMARY_FILE, 'w', encoding='utf-8') as f:
+            pstats.Stats(profiler, stream=f).sort_stats('cumulative').print_stats(30)
+            f.write("\nTop allocations:\n")
+            for stat in snapshot.statistics('lineno')[:20]:
+                f.write(f"{stat}\n")
+        logging.info(f"Profile written to {PROFILE_FILE} and {PROFILE_SUMMARY_FILE}")
+
 def main():
+    parser = argparse.ArgumentParser(description="Publish the daily Kedma Jewish history post")
+    parser.add_argument('--check-links', action='store_true',
+                        help="check every subject_url in the archive instead of posting")
+    parser.add_argument('--validate', action='store_true',
+                        help="download and score every archive page, recording the results in the archive")
+    parser.add_argument('--max-age', type=int, metavar='DAYS',
+                        help="with --validate, skip events checked within the last DAYS days")
+    parser.add_argument('--pregenerate', type=int, nargs='?', const=PREGENERATE_DAYS, metavar='DAYS',
+                        help=f"queue posts for the next DAYS days (default {PREGENERATE_DAYS}) instead of posting")
+    parser.add_argument('--workers', type=int, default=PREGENERATE_WORKERS,
+                        help="parallel summaries when pre-generating")
+    parser.add_argument('--plan', type=int, nargs='?', const=PLAN_DAYS, metavar='DAYS',
+                        help=f"preview the event schedule for the next DAYS days (default {PLAN_DAYS})")
+    parser.add_argument('--daemon', action='store_true',
+                        help=f"stay resident and post daily at {DAEMON_POST_TIME} ({DAEMON_TIMEZONE})")
+    parser.add_argument('--profile', action='store_true',
+                        help=f"write a cProfile dump ({PROFILE_FILE}) and tracemalloc summary ({PROFILE_SUMMARY_FILE})")
+    args = parser.parse_args()
+
     log_group("Initializing Script")
     try:
-        run()
+        if args.check_links:
+            task = lambda: check_archive_links(load_events())
+        elif args.validate:
+            from Validation import validate_archive
+            task = lambda: validate_archive(max_age=args.max_age)
+        elif args.pregenerate:
+            task = lambda: pregenerate(args.pregenerate, args.workers)
+        elif args.plan:
+            task = lambda: print_plan(args.plan)
+        elif args.daemon:
+            task = lambda: asyncio.run(Daemon(workers=args.workers).serve())
+        else:
+            task = run
+        if args.profile:
+            profiled(task)
+        else:
+            task()
     finally:
+        write_run_report()
         log_end_group()
 
 if __name__ == "__main__":
@@ -0,0 +1,141 @@
+import copy
+import json
+import os
+import random
+from datetime import date
+from typing import Dict, Any, Optional, List, Iterable
+
+from EventStore import event_id, is_usable, store_key
+from HebrewCalendar import hebrew_day
+
+ROTATION_LEDGER_FILE = "rotation_ledger.json"
+FALLBACK_KEY = "*"  # Ledger bucket for archive fallbacks on dates without events
+FALLBACK_DRAWS = 20  # Random draws tried before accepting a repeated or unusable fallback
+FALLBACK_MEMORY = 365  # Fallback picks remembered
+
+
+class RotationLedger:
+    """
+    Which events have been used for each Hebrew (month, day). A date's
+    events are not repeated until all of them have been used; then its
+    cycle starts over. Without a path the ledger lives in memory only.
+    """
+    def __init__(self, path: Optional[str] = ROTATION_LEDGER_FILE):
+        self.path = path
+        self.used: Dict[str, List[str]] = {}
+        if path:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.used = json.load(f)
+            except (OSError, ValueError):
+                pass
+
+    def preview(self) -> 'RotationLedger':
+        """In-memory copy to plan against without recording anything"""
+        ledger = RotationLedger(None)
+        ledger.used = copy.deepcopy(self.used)
+        return ledger
+
+    def pick(self, key: str, candidates: List[Dict[str, Any]], reserve: int = 0) -> Optional[Dict[str, Any]]:
+        """
+        Random candidate not yet used in this date's cycle, recorded as used;
+        once the pool is exhausted a new cycle starts. With `reserve`, only
+        picks while more than that many unused candidates remain (keeping them
+        for a later date in the same cycle) and never restarts the cycle.
+        """
+        if not candidates:
+            return None
+        used = set(self.used.get(key, ()))
+        fresh = [e for e in candidates if event_id(e) not in used]
+        if reserve:
+            if len(fresh) <= reserve:
+                return None
+        elif not fresh:
+            self.used[key] = []
+            fresh = candidates
+        event = random.choice(fresh)
+        self.used.setdefault(key, []).append(event_id(event))
+        return event
+
+    def pick_fallback(self, events) -> Optional[Dict[str, Any]]:
+        """Archive-wide pick for dates without events, avoiding recent fallbacks and events that failed validation"""
+        if hasattr(events, 'random_event'):
+            draw = events.random_event
+        else:
+            draw = lambda: random.choice(events) if events else None
+        used = set(self.used.get(FALLBACK_KEY, ()))
+        event = None
+        for _ in range(FALLBACK_DRAWS):
+            event = draw()
+            if event is None or (event_id(event) not in used and is_usable(event)):
+                break
+        if event is not None:
+            recent = self.used.setdefault(FALLBACK_KEY, [])
+            recent.append(event_id(event))
+            del recent[:-FALLBACK_MEMORY]
+        return event
+
+    def release(self, planned: Dict[str, Any]) -> None:
+        """Undo the pick of a planned date (see plan_schedule) whose post was never made"""
+        key, event = planned.get('rotation_key'), planned.get('event')
+        used = self.used.get(key, [])
+        if event is not None and event_id(event) in used:
+            del used[len(used) - 1 - used[::-1].index(event_id(event))]  # The latest occurrence
+        if key in self.used and not used:
+            del self.used[key]
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        tmp = f"{self.path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.used, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, self.path)
+
+
+def _bucketed(events):
+    """Lookup with a candidates(day, month) method; lists are bucketed once"""
+    if hasattr(events, 'candidates'):
+        return events.candidates
+    buckets: Dict[str, List[Dict[str, Any]]] = {}
+    for event in events:
+        buckets.setdefault(store_key(event['day'], event['month']), []).append(event)
+    return lambda day, month: buckets.get(store_key(day, month), [])
+
+
+def plan_schedule(events, dates: Iterable[date], ledger: Optional[RotationLedger] = None) -> List[Dict[str, Any]]:
+    """
+    Assign an event to each date through the rotation ledger. Events that
+    failed validation are left out. Dates with no usable events of their own
+    get an archive fallback (from_archive=True), or event=None if the archive
+    is empty. The picks are recorded in the ledger but not saved: callers
+    release() the dates whose posts could not be generated, then save(), so
+    a failed event stays in its date's cycle.
+
+    The archive has a single Adar. In leap years Adar II keeps its events,
+    as commemorations move to Adar II; Adar I only takes an event when
+    another unused one is left for Adar II, so no event runs in both months.
+    """
+    ledger = ledger if ledger is not None else RotationLedger(None)
+    bucket = _bucketed(events)
+    candidates = lambda day, month: [e for e in bucket(day, month) if is_usable(e)]
+    schedule = []
+    for day in dates:
+        hd = hebrew_day(day)
+        adar_i = hd.month == 12 and hd.month_name != hd.archive_month
+        key = store_key(hd.day_name, hd.archive_month)
+        event = ledger.pick(key, candidates(hd.day_name, hd.archive_month), reserve=1 if adar_i else 0)
+        from_archive = event is None
+        if from_archive:
+            key = FALLBACK_KEY
+            event = ledger.pick_fallback(events)
+        schedule.append({
+            'date': day,
+            'hebrew_date': hd.key,
+            'hebrew_day': hd.day_name,
+            'hebrew_month': hd.month_name,
+            'event': event,
+            'from_archive': from_archive,
+            'rotation_key': key,
+        })
+    return schedule
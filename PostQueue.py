@@ -0,0 +1,59 @@
+import json
+import os
+from datetime import date
+from typing import Dict, Any, Optional, List
+
+POST_QUEUE_DIR = "post_queue"
+
+
+class PostQueue:
+    """
+    Durable on-disk queue of ready-to-publish posts, one JSON file per
+    publication date (YYYY-MM-DD.json). Writes are atomic, and an entry is
+    only removed once its post has been delivered (ack).
+    """
+    def __init__(self, directory: str = POST_QUEUE_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    @staticmethod
+    def key(day: date) -> str:
+        return day.strftime('%Y-%m-%d')
+
+    def put(self, day: date, entry: Dict[str, Any]) -> None:
+        path = self._path(self.key(day))
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, ensure_ascii=False, indent=4)
+        os.replace(tmp, path)
+
+    def get(self, day: date) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(self.key(day)), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def __contains__(self, day: date) -> bool:
+        return os.path.exists(self._path(self.key(day)))
+
+    def ack(self, day: date) -> None:
+        """Drop a delivered entry"""
+        try:
+            os.remove(self._path(self.key(day)))
+        except FileNotFoundError:
+            pass
+
+    def pending(self) -> List[str]:
+        return sorted(name[:-len('.json')] for name in os.listdir(self.directory) if name.endswith('.json'))
+
+    def prune(self, before: date) -> int:
+        """Remove entries for dates that have already passed; returns how many"""
+        cutoff = self.key(before)
+        stale = [key for key in self.pending() if key < cutoff]
+        for key in stale:
+            os.remove(self._path(key))
+        return len(stale)
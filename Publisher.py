@@ -0,0 +1,206 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Dict, Any, Optional, List
+
+import httpx
+
+from RateLimiter import CircuitOpen, backoff_delay
+from Telemetry import telemetry
+
+TELEGRAM_MAX_MESSAGE = 4096  # Characters per sendMessage text
+TELEGRAM_GLOBAL_RATE = 30  # Messages per second across all chats (bulk notification limit)
+TELEGRAM_CHAT_RATE = 1  # Messages per second to one private chat
+TELEGRAM_GROUP_RATE = 20 / 60  # Messages per second to one group or channel
+TELEGRAM_GROUP_BURST = 3
+PUBLISH_RETRIES = 3  # Attempts per message for 429s, 5xx and connection errors
+PUBLISH_BACKOFF = 1.0  # Base delay for jittered backoff (seconds)
+DESTINATIONS_FILE = os.getenv('TELEGRAM_DESTINATIONS_FILE', "telegram_destinations.json")
+DEFAULT_LANGUAGE = "he"
+
+
+class TokenBucket:
+    """
+    Async token bucket: `rate` tokens per second up to `capacity`. Waiters are
+    served in arrival order, and pause() blocks the bucket entirely (used for
+    Telegram's retry_after).
+    """
+    def __init__(self, rate: float, capacity: float = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                wait = self.blocked_until - now
+                if wait <= 0 and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep(max(wait, (1 - self.tokens) / self.rate))
+
+    def pause(self, seconds: float) -> None:
+        now = time.monotonic()
+        self._refill(now)
+        self.tokens = 0
+        self.blocked_until = max(self.blocked_until, now + seconds)
+
+
+def is_private_chat(chat_id) -> bool:
+    """Users have positive numeric ids; groups and channels are negative or @usernames"""
+    return str(chat_id).isdigit()
+
+
+def split_message(text: str, limit: int = TELEGRAM_MAX_MESSAGE) -> List[str]:
+    """
+    Split a post into messages of at most `limit` characters, preferring
+    paragraph, then line, then word boundaries so Markdown entities are
+    rarely cut in half.
+    """
+    parts = []
+    text = text.strip()
+    while len(text) > limit:
+        for separator in ('\n\n', '\n', ' '):
+            cut = text.rfind(separator, 0, limit)
+            if cut > limit // 2:
+                break
+        else:
+            cut = limit
+        parts.append(text[:cut].rstrip())
+        text = text[cut:].lstrip()
+    if text:
+        parts.append(text)
+    return parts
+
+
+def load_destinations(filename: str = DESTINATIONS_FILE, default_chat: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Destinations from a JSON list of chat ids or {"chat_id", "language"}
+    objects; a missing file means just `default_chat` in the default language.
+    """
+    try:
+        with open(filename, 'r', encoding='utf-8') as f:
+            entries = json.load(f)
+    except FileNotFoundError:
+        entries = [default_chat] if default_chat else []
+    except (OSError, ValueError) as e:
+        logging.error(f"Could not read destinations from {filename}: {str(e)}")
+        entries = [default_chat] if default_chat else []
+
+    destinations = []
+    for entry in entries:
+        if not isinstance(entry, dict):
+            entry = {'chat_id': entry}
+        destinations.append({'chat_id': entry['chat_id'], 'language': entry.get('language', DEFAULT_LANGUAGE)})
+    return destinations
+
+
+class FanOutPublisher:
+    """
+    Publishes one post to many Telegram chats concurrently. Every message
+    waits for a token from its chat's bucket and then from the bot-wide
+    bucket; 429 responses pause the chat for the returned retry_after, and
+    5xx or connection errors are retried with jittered backoff.
+    """
+    def __init__(self, bot, global_rate: float = TELEGRAM_GLOBAL_RATE, retries: int = PUBLISH_RETRIES,
+                 backoff: float = PUBLISH_BACKOFF):
+        self.bot = bot  # TelegramBot with a transport
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.retries = retries
+        self.backoff = backoff
+        self._chat_buckets: Dict[str, TokenBucket] = {}
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        key = str(chat_id)
+        if key not in self._chat_buckets:
+            if is_private_chat(chat_id):
+                self._chat_buckets[key] = TokenBucket(TELEGRAM_CHAT_RATE)
+            else:
+                self._chat_buckets[key] = TokenBucket(TELEGRAM_GROUP_RATE, TELEGRAM_GROUP_BURST)
+        return self._chat_buckets[key]
+
+    async def publish(self, variants: Dict[str, str],
+                      destinations: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """
+        Send the variant matching each destination's language (falling back
+        to the default language); returns a delivery report keyed by chat id.
+        """
+        with telemetry.span('telegram.fan_out', destinations=len(destinations)):
+            reports = await asyncio.gather(*(
+                self._deliver(d['chat_id'], d.get('language', DEFAULT_LANGUAGE), variants) for d in destinations
+            ))
+        return {str(d['chat_id']): report for d, report in zip(destinations, reports)}
+
+    async def _deliver(self, chat_id, language: str, variants: Dict[str, str]) -> Dict[str, Any]:
+        start = time.monotonic()
+        if language not in variants:
+            logging.warning(f"No {language} variant for {chat_id}; sending {DEFAULT_LANGUAGE}")
+            language = DEFAULT_LANGUAGE
+        parts = split_message(variants[language])
+        report = {'ok': False, 'language': language, 'parts': len(parts), 'message_ids': [],
+                  'attempts': 0, 'rate_limited': 0, 'error': None}
+
+        for part in parts:
+            result = await self._send(chat_id, part, report)
+            if not result.get('ok'):
+                report['error'] = result.get('description') or 'unknown error'
+                logging.error(f"Delivery to {chat_id} failed: {report['error']}")
+                break
+            report['message_ids'].append(result['result']['message_id'])
+        else:
+            report['ok'] = True
+            telemetry.count('messages', len(parts))
+
+        report['seconds'] = round(time.monotonic() - start, 3)
+        return report
+
+    async def _send(self, chat_id, text: str, report: Dict[str, Any]) -> Dict[str, Any]:
+        """One message with rate limiting and retries; returns Telegram's response body"""
+        bucket = self._chat_bucket(chat_id)
+        plain = False
+        result: Dict[str, Any] = {}
+        attempt = 0
+        while attempt < self.retries:
+            attempt += 1
+            report['attempts'] += 1
+            await bucket.acquire()
+            await self.global_bucket.acquire()
+            try:
+                result = await self.bot.post_message_async(chat_id, text, markdown=not plain)
+            except (httpx.HTTPError, CircuitOpen) as e:
+                result = {'ok': False, 'description': f"{type(e).__name__}: {e}"}
+                error_code = None
+            else:
+                if result.get('ok'):
+                    return result
+                error_code = result.get('error_code')
+
+            retry_after = (result.get('parameters') or {}).get('retry_after')
+            if error_code == 429 and retry_after:
+                report['rate_limited'] += 1
+                telemetry.count('rate_limited')
+                logging.warning(f"Telegram rate limit for {chat_id}; retrying after {retry_after}s")
+                bucket.pause(retry_after)
+                continue
+            if error_code == 400 and not plain and "can't parse entities" in result.get('description', ''):
+                # A split cut a Markdown entity in half; send this part as plain text
+                plain = True
+                attempt -= 1
+                continue
+            if error_code is not None and error_code < 500:
+                return result  # Blocked, chat not found, bad request: retrying will not help
+            if attempt < self.retries:
+                telemetry.count('retries')
+                await asyncio.sleep(backoff_delay(attempt, self.backoff))
+        return result
@@ -0,0 +1,249 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+import urllib.parse
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Any, Optional, List
+
+from Telemetry import telemetry
+
+HOST_RATE = 50.0  # Requests per second per host unless HOST_RATES says otherwise
+HOST_RATES = {
+    'api.telegram.org': 30.0,  # Bot-wide bulk limit
+}
+HOST_MAX_CONCURRENCY = 8  # Ceiling of the adaptive per-host concurrency limit (async requests)
+HOST_MIN_CONCURRENCY = 1
+DECREASE_INTERVAL = 1.0  # Failures within this long of a cut count as one congestion signal (seconds)
+BREAKER_FAILURES = 5  # Consecutive 429/5xx/connection failures that open a host's circuit
+BREAKER_COOLDOWN = 30.0  # How long an open circuit rejects requests before a probe (seconds)
+MAX_RETRY_AFTER_WAIT = 60.0  # A longer Retry-After opens the circuit instead of waiting it out
+
+
+class CircuitOpen(Exception):
+    """Raised instead of sending a request to a host whose circuit is open"""
+
+
+def backoff_delay(attempt: int, base: float) -> float:
+    """Exponential backoff with full jitter"""
+    return random.uniform(0, base * 2 ** (attempt - 1))
+
+
+def retry_after(headers) -> Optional[float]:
+    """Seconds from a Retry-After header (delta-seconds or HTTP-date), or None"""
+    value = headers.get('Retry-After') if headers is not None else None
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max((when - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+def is_failure(status: Optional[int]) -> bool:
+    """Responses that signal an overloaded or failing host: connection errors (no status), 429 and 5xx"""
+    return status is None or status == 429 or status >= 500
+
+
+class HostLimiter:
+    """
+    Limits for one host: a token bucket for the request rate, pauses for
+    Retry-After, an AIMD concurrency limit (one more slot per limit's worth
+    of successes, halved on a 429 or 5xx) and a circuit breaker that rejects
+    requests for a while after repeated failures, then lets one probe
+    through. Rate, pauses and the breaker apply to every request; the
+    concurrency limit applies to async requests.
+    """
+    def __init__(self, host: str, rate: float = HOST_RATE, max_concurrency: int = HOST_MAX_CONCURRENCY):
+        self.host = host
+        self.rate = rate
+        self.capacity = max(rate, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.max_concurrency = max_concurrency
+        self.limit = float(max_concurrency)
+        self.in_flight = 0
+        self.failures = 0  # Consecutive
+        self.opened_until = 0.0
+        self.probing = False
+        self.last_decrease = 0.0
+        self.stats = {'requests': 0, 'throttled': 0, 'errors': 0, 'circuit_opened': 0, 'rejected': 0,
+                      'wait_s': 0.0}
+        self._lock = threading.Lock()
+        self._waiters: List[asyncio.Future] = []
+
+    @property
+    def state(self) -> str:
+        if not self.opened_until:
+            return 'closed'
+        return 'open' if time.monotonic() < self.opened_until else 'half_open'
+
+    @property
+    def concurrency(self) -> int:
+        return max(HOST_MIN_CONCURRENCY, int(self.limit))
+
+    def blocked_for(self) -> float:
+        """Seconds left of the host's Retry-After pause"""
+        return max(self.blocked_until - time.monotonic(), 0.0)
+
+    def _admit(self, now: float) -> bool:
+        """Circuit check (under the lock); True when this request is the half-open probe"""
+        if not self.opened_until:
+            return False
+        if now < self.opened_until or self.probing:
+            self.stats['rejected'] += 1
+            raise CircuitOpen(f"{self.host}: circuit open for another {max(self.opened_until - now, 0):.0f}s")
+        self.probing = True
+        return True
+
+    def _take(self, now: float) -> float:
+        """Take a token (under the lock); returns how long to wait before sending"""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        wait = max(-self.tokens / self.rate, self.blocked_until - now, 0.0)
+        self.stats['requests'] += 1
+        self.stats['wait_s'] += wait
+        return wait
+
+    def reserve(self) -> float:
+        """
+        Take a token and return how long to wait before sending. Raises
+        CircuitOpen while the circuit is open, and for all but one probe
+        request once its cooldown is over.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._admit(now)
+            return self._take(now)
+
+    def wait(self) -> None:
+        """Blocking reserve() for synchronous clients"""
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    @asynccontextmanager
+    async def slot(self):
+        """One async request: waits for a concurrency slot, then for a token"""
+        with self._lock:
+            probe = self._admit(time.monotonic())
+        try:
+            while self.in_flight >= self.concurrency:
+                waiter = asyncio.get_running_loop().create_future()
+                self._waiters.append(waiter)
+                try:
+                    await waiter
+                finally:
+                    if waiter in self._waiters:
+                        self._waiters.remove(waiter)
+            self.in_flight += 1
+            try:
+                with self._lock:
+                    delay = self._take(time.monotonic())
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                yield
+            finally:
+                self.in_flight -= 1
+                self._wake()
+        finally:
+            if probe:
+                self.probing = False  # Cancelled before record(), let another request probe
+
+    def _wake(self) -> None:
+        free = self.concurrency - self.in_flight
+        for waiter in self._waiters[:max(free, 0)]:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    def record(self, status: Optional[int], retry_after: Optional[float] = None, scoped_429: bool = False) -> None:
+        """
+        Feed back the outcome of a request (status None for a connection
+        error). With scoped_429 a 429 only limited one resource, such as a
+        Telegram chat, and the caller handles it; the host is not slowed down.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.probing = False
+            if status == 429 and scoped_429:
+                self.stats['throttled'] += 1
+                return
+            if not is_failure(status):
+                self.failures = 0
+                if self.opened_until:
+                    logging.info(f"{self.host}: circuit closed")
+                    self.opened_until = 0.0
+                self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+                return
+
+            self.failures += 1
+            self.stats['throttled' if status == 429 else 'errors'] += 1
+            telemetry.count('throttled' if status == 429 else 'host_errors')
+            if now - self.last_decrease >= DECREASE_INTERVAL:
+                self.limit = max(HOST_MIN_CONCURRENCY, self.limit / 2)
+                self.last_decrease = now
+            if retry_after:
+                self.blocked_until = max(self.blocked_until, now + retry_after)
+            cooldown = None
+            if retry_after and retry_after > MAX_RETRY_AFTER_WAIT:
+                cooldown = retry_after
+            elif self.failures >= BREAKER_FAILURES or self.opened_until:  # A failed probe reopens
+                cooldown = BREAKER_COOLDOWN
+            if cooldown:
+                self.opened_until = now + cooldown
+                self.stats['circuit_opened'] += 1
+                telemetry.count('circuit_opened')
+                logging.warning(f"{self.host}: circuit open for {cooldown:.0f}s after {self.failures} failures")
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self.stats,
+                'wait_s': round(self.stats['wait_s'], 3),
+                'open': int(self.state != 'closed'),
+                'concurrency': self.concurrency,
+            }
+
+
+class RateLimiter:
+    """Per-host limiters shared by every client in the process (see HostLimiter)"""
+    def __init__(self):
+        self.hosts: Dict[str, HostLimiter] = {}
+        self._lock = threading.Lock()
+
+    def host(self, url: str) -> HostLimiter:
+        host = urllib.parse.urlsplit(url).netloc
+        with self._lock:
+            if host not in self.hosts:
+                self.hosts[host] = HostLimiter(host, HOST_RATES.get(host, HOST_RATE))
+            return self.hosts[host]
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            hosts = dict(self.hosts)
+        return {host: limiter.metrics() for host, limiter in hosts.items()}
+
+    def record_metrics(self) -> None:
+        """Copy per-host metrics into the telemetry counters (limiter.<host>.<metric>)"""
+        for host, metrics in self.metrics().items():
+            for key, value in metrics.items():
+                telemetry.counters[f'limiter.{host}.{key}'] = value
+
+    def reset(self) -> None:
+        with self._lock:
+            self.hosts.clear()
+
+
+rate_limiter = RateLimiter()
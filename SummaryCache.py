@@ -0,0 +1,131 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Any, Optional, Iterable
+
+SUMMARY_CACHE_DIR = os.getenv('SUMMARY_CACHE_DIR', '.summary_cache')
+SUMMARY_CACHE_MAX_ENTRIES = 5000
+SUMMARY_CACHE_MAX_AGE: Optional[float] = None  # Seconds before an entry is regenerated; None keeps entries forever
+CACHED_FIELDS = ('summary', 'ai', 'model', 'tokens_used')
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class SummaryCache:
+    """
+    On-disk cache of AI summaries, content-addressed by (event subject, hash
+    of the text sent to the model, prompt version, model). A changed source
+    or prompt simply misses. The number of entries is bounded by evicting the
+    least recently used ones, and entries older than max_age are not served.
+    """
+    def __init__(self, directory: str = SUMMARY_CACHE_DIR, max_entries: int = SUMMARY_CACHE_MAX_ENTRIES,
+                 max_age: Optional[float] = SUMMARY_CACHE_MAX_AGE):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.stats = {'hits': 0, 'misses': 0, 'expired': 0, 'stored': 0, 'evicted': 0, 'tokens_saved': 0}
+        self._lock = threading.Lock()
+        self._entries: Optional[int] = None
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: list) -> str:
+        digest = hashlib.sha256(json.dumps(key, ensure_ascii=False).encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, f"{digest}.json")
+
+    def _count(self, stat: str, value: int = 1) -> None:
+        with self._lock:
+            self.stats[stat] += value
+
+    def get(self, subject: str, text: str, prompt_version: str, models: Iterable[str]) -> Optional[Dict[str, Any]]:
+        """
+        Cached summary of `text` by the first of `models` that has one, or
+        None. A hit counts the entry's tokens as saved.
+        """
+        digest = text_hash(text)
+        for model in models:
+            key = [subject, digest, prompt_version, model]
+            path = self._path(key)
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if entry.get('key') != key:
+                continue
+            if self.max_age is not None and time.time() - entry['stored_at'] > self.max_age:
+                self._count('expired')
+                continue
+            try:
+                os.utime(path)  # mtime doubles as the LRU access time
+            except OSError:
+                pass
+            self._count('hits')
+            self._count('tokens_saved', entry.get('tokens_used', 0))
+            return {field: entry[field] for field in CACHED_FIELDS}
+        self._count('misses')
+        return None
+
+    def put(self, subject: str, text: str, prompt_version: str, result: Dict[str, Any]) -> None:
+        """Store a successful summary under the model that wrote it"""
+        key = [subject, text_hash(text), prompt_version, result['model']]
+        entry = {'key': key, 'stored_at': time.time(), **{field: result[field] for field in CACHED_FIELDS}}
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp, path)
+        self._count('stored')
+        with self._lock:
+            if self._entries is not None:
+                self._entries += 1
+            over = self._entries is None or self._entries > self.max_entries
+        if over:
+            self.evict()
+
+    def evict(self) -> None:
+        """Drop least recently used entries until at most max_entries remain"""
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                entries.append((os.stat(path).st_mtime, path))
+            except OSError:
+                continue
+        excess = len(entries) - self.max_entries
+        if excess > 0:
+            for _, path in sorted(entries)[:excess]:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                self._count('evicted')
+        with self._lock:
+            self._entries = min(len(entries), self.max_entries)
+
+    def log_stats(self, label: str = "Summary cache") -> None:
+        s = self.stats
+        logging.info(
+            f"{label}: {s['hits']} hits, {s['misses']} misses, {s['expired']} expired, "
+            f"{s['evicted']} evicted, {s['tokens_saved']} tokens saved"
+        )
+
+
+_default_cache: Optional[SummaryCache] = None
+
+
+def default_summary_cache() -> Optional[SummaryCache]:
+    """Process-wide summary cache; disabled when SUMMARY_CACHE_DIR is empty"""
+    global _default_cache
+    if _default_cache is None and SUMMARY_CACHE_DIR:
+        try:
+            _default_cache = SummaryCache()
+        except OSError as e:
+            logging.warning(f"Summary cache disabled: {str(e)}")
+    return _default_cache
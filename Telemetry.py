@@ -0,0 +1,116 @@
+import contextvars
+import json
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Any, List
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+RUN_REPORT_JSON = "run_report.json"
+RUN_REPORT_MD = "run_report.md"
+
+# Spans open in the current context, innermost last
+_active_spans: contextvars.ContextVar = contextvars.ContextVar('active_spans', default=())
+
+
+def peak_rss_mb() -> float:
+    """Peak resident memory of the process so far"""
+    if resource is None:
+        return 0.0
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+class Telemetry:
+    """
+    Lightweight spans and counters for one process. Counters recorded inside a
+    span are attributed to it and to every enclosing span; threads started with
+    contextvars.copy_context().run() inherit the caller's spans.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """Start a fresh report (used between benchmark iterations)"""
+        with self._lock:
+            self.started = time.time()
+            self.spans: List[Dict[str, Any]] = []
+            self.counters: Dict[str, float] = defaultdict(float)
+
+    @contextmanager
+    def span(self, name: str, **attrs):
+        record = {
+            'name': name,
+            'start_s': round(time.time() - self.started, 4),
+            'depth': len(_active_spans.get()),
+            'wall_s': 0.0,
+            'counters': defaultdict(float),
+            **attrs,
+        }
+        token = _active_spans.set(_active_spans.get() + (record,))
+        start = time.perf_counter()
+        try:
+            yield record
+        except Exception as e:
+            record['error'] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            record['wall_s'] = round(time.perf_counter() - start, 4)
+            record['peak_rss_mb'] = peak_rss_mb()
+            _active_spans.reset(token)
+            with self._lock:
+                self.spans.append(record)
+
+    def count(self, key: str, value: float = 1) -> None:
+        with self._lock:
+            self.counters[key] += value
+            for record in _active_spans.get():
+                record['counters'][key] += value
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'started': datetime.fromtimestamp(self.started).isoformat(timespec='seconds'),
+                'wall_s': round(time.time() - self.started, 4),
+                'peak_rss_mb': peak_rss_mb(),
+                'counters': dict(self.counters),
+                'spans': [{**s, 'counters': dict(s['counters'])} for s in self.spans],
+            }
+
+    def write_json(self, path: str = RUN_REPORT_JSON) -> None:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, ensure_ascii=False, indent=4)
+
+    def markdown(self) -> str:
+        report = self.report()
+        lines = [
+            "### Run report",
+            "",
+            "| Stage | Wall (s) | Retries | Bytes | Tokens | Peak RSS (MB) |",
+            "|---|---:|---:|---:|---:|---:|",
+        ]
+        for s in sorted(report['spans'], key=lambda s: s['start_s']):
+            c = s['counters']
+            name = '↳ ' * min(s['depth'], 1) + '&nbsp;&nbsp;' * max(s['depth'] - 1, 0) + s['name']
+            name += ' ⚠️' if 'error' in s else ''
+            lines.append(
+                f"| {name} | {s['wall_s']:.3f} | {int(c.get('retries', 0))} | {int(c.get('bytes', 0))} "
+                f"| {int(c.get('tokens', 0))} | {s['peak_rss_mb']} |"
+            )
+        lines.append(f"| **total** | {report['wall_s']:.3f} | {int(report['counters'].get('retries', 0))} "
+                     f"| {int(report['counters'].get('bytes', 0))} | {int(report['counters'].get('tokens', 0))} "
+                     f"| {report['peak_rss_mb']} |")
+        return '\n'.join(lines) + '\n'
+
+    def write_markdown(self, path: str = RUN_REPORT_MD) -> None:
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.markdown())
+
+
+telemetry = Telemetry()
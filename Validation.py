@@ -0,0 +1,177 @@
+"""
+Archive-wide content validation. Every subject_url is resolved through the
+MediaWiki API, the live pages are downloaded concurrently and run through
+the bot's own extraction in a process pool, and each event gets a
+'validation' entry in hebrew_events.json:
+
+    {"status": "ok", "content_chars": 3180, "score": 0.8, "checked": "2026-10-16"}
+
+status is ok, redirect, missing, invalid, short (less than MIN_CONTENT_CHARS
+of usable text) or error (the check itself failed). Event selection skips
+missing, invalid and short events (EventStore.is_usable).
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from typing import Dict, Any, Optional, List
+
+import httpx
+
+from AsyncTransport import AsyncTransport
+from EventDatabase import compile_event_database, EVENT_DB_FILE
+from EventStore import HEBREW_EVENTS_FILE, BAD_STATUSES, compile_events_file
+from JewishHistoryBot import (WikipediaClient, extract_content_streaming, title_from_url, MAX_CONTENT_LENGTH,
+                              STREAM_CHUNK_SIZE)
+from RateLimiter import CircuitOpen
+from Telemetry import telemetry
+
+VALIDATE_CONCURRENCY = 16  # Pages downloaded at once (the per-host limits still apply)
+MIN_CONTENT_CHARS = 200  # Less usable article text than this makes a poor post
+SCORE_FULL_CHARS = MAX_CONTENT_LENGTH  # Content this long scores 1.0
+
+
+def content_chars(html: str) -> int:
+    """Length of the text the bot would send for summarizing; -1 when the page has no article body"""
+    chunks = (html[i:i + STREAM_CHUNK_SIZE] for i in range(0, len(html), STREAM_CHUNK_SIZE))
+    try:
+        text = extract_content_streaming(chunks)
+    except ValueError:
+        return -1
+    return len(' '.join(text.split()))
+
+
+def _result(status: str, chars: int = 0, **extra) -> Dict[str, Any]:
+    return {
+        'status': status,
+        'content_chars': chars,
+        'score': round(min(chars / SCORE_FULL_CHARS, 1.0), 2),
+        'checked': date.today().isoformat(),
+        **extra,
+    }
+
+
+async def _crawl(urls: List[str], wiki: WikipediaClient, concurrency: int,
+                 pages: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Download pages with bounded parallelism, extracting each in a process pool as it arrives"""
+    limit = asyncio.Semaphore(concurrency)
+    loop = asyncio.get_running_loop()
+
+    with ProcessPoolExecutor() as pool:
+        async def check(url: str) -> Dict[str, Any]:
+            try:
+                async with limit:
+                    html = await wiki.fetch_html_async(url)
+            except httpx.HTTPStatusError as e:
+                if e.response.status_code == 404:
+                    return _result('missing')
+                return _result('error', error=f"HTTP {e.response.status_code}")
+            except (httpx.HTTPError, CircuitOpen, ValueError) as e:
+                return _result('error', error=f"{type(e).__name__}: {e}")
+
+            chars = await loop.run_in_executor(pool, content_chars, html)
+            if chars < MIN_CONTENT_CHARS:
+                return _result('short', max(chars, 0))
+            page = pages.get(url, {})
+            if page.get('status') == 'redirect':
+                return _result('redirect', chars, title=page['title'])
+            return _result('ok', chars)
+
+        results = await asyncio.gather(*(check(url) for url in urls))
+    return dict(zip(urls, results))
+
+
+def validate_events(events: List[Dict[str, Any]], concurrency: int = VALIDATE_CONCURRENCY,
+                    wiki: Optional[WikipediaClient] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Validate the distinct subject_urls of `events`: dead and invalid titles
+    are found with batched API queries, everything else is downloaded and
+    extracted. Returns {subject_url: validation}.
+    """
+    urls = list(dict.fromkeys(e['subject_url'] for e in events if e.get('subject_url')))
+    with telemetry.span('validate.resolve', links=len(urls)):
+        wiki = wiki or WikipediaClient()
+        titles = wiki.fetch_pages([title_from_url(url) for url in urls], extracts=False)
+        pages = {url: titles[title_from_url(url)] for url in urls}
+
+    results = {url: _result(page['status']) for url, page in pages.items()
+               if page['status'] in ('missing', 'invalid')}
+    crawl = [url for url in urls if url not in results]
+
+    async def crawl_all() -> Dict[str, Dict[str, Any]]:
+        async with AsyncTransport() as transport:
+            crawler = WikipediaClient(wiki.cache, api_url=wiki.api_url, base_url=wiki.base_url, transport=transport)
+            return await _crawl(crawl, crawler, concurrency, pages)
+
+    with telemetry.span('validate.crawl', pages=len(crawl)):
+        results.update(asyncio.run(crawl_all()))
+    return results
+
+
+def apply_validation(events: List[Dict[str, Any]], results: Dict[str, Dict[str, Any]]) -> int:
+    """
+    Store each event's result as its 'validation' metadata; returns how many
+    events changed status or content length. A failed check does not replace
+    an earlier result.
+    """
+    changed = 0
+    for event in events:
+        result = results.get(event.get('subject_url'))
+        previous = event.get('validation')
+        if result is None or (result['status'] == 'error' and previous):
+            continue
+        before = previous or {}
+        if (before.get('status'), before.get('content_chars')) != (result['status'], result['content_chars']):
+            changed += 1
+        event['validation'] = result
+    return changed
+
+
+def validate_archive(filename: str = HEBREW_EVENTS_FILE, concurrency: int = VALIDATE_CONCURRENCY,
+                     max_age: Optional[int] = None) -> Dict[str, int]:
+    """
+    Validate the archive in place and recompile the event store (and the
+    SQLite database if there is one). With max_age, only events never checked
+    or checked more than max_age days ago are validated. Returns counts per status.
+    """
+    with open(filename, 'r', encoding='utf-8') as f:
+        events = json.load(f)
+    todo = events
+    if max_age is not None:
+        today = date.today()
+        todo = [e for e in events
+                if not e.get('validation')
+                or (today - date.fromisoformat(e['validation']['checked'])).days > max_age]
+        if not todo:
+            logging.info(f"All {len(events)} events were checked within the last {max_age} days")
+            return {}
+
+    started = time.perf_counter()
+    results = validate_events(todo, concurrency)
+    elapsed = time.perf_counter() - started
+    changed = apply_validation(todo, results)
+
+    tmp = f"{filename}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(events, f, ensure_ascii=False, indent=4)
+    os.replace(tmp, filename)
+    compile_events_file(filename)
+    if os.path.exists(EVENT_DB_FILE):
+        compile_event_database(filename)
+
+    counts: Dict[str, int] = {}
+    for event in todo:
+        status = event['validation']['status'] if event.get('validation') else 'unchecked'
+        counts[status] = counts.get(status, 0) + 1
+        if status in BAD_STATUSES:
+            logging.warning(f"{status.capitalize()}: {event['day']} {event['month']} {event.get('year', '')} "
+                            f"{event['subject_url']} ({event['validation']['content_chars']} chars)")
+    logging.info(
+        f"Validated {len(results)} pages for {len(todo)} events in {elapsed:.1f}s "
+        f"({len(results) / max(elapsed, 1e-9):.1f} pages/s), {changed} results changed: "
+        + ', '.join(f"{k}={v}" for k, v in sorted(counts.items()))
+    )
+    return counts
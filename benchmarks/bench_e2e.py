@@ -0,0 +1,247 @@
+"""
+Offline end-to-end benchmark of the bot against local fake services.
+
+Scenarios:
+  run      - JewishHistoryBot.run() repeated --iterations times (live generation path)
+  scrape   - HebrewEvents month scraping, serial and concurrent
+  links    - archive-wide link check through the batched MediaWiki API
+  pregen   - pre-generation of a week of posts
+  fanout   - one post published to --destinations chats under Telegram rate limits
+
+Reports p50/p95/p99 per stage and end-to-end, plus throughput for batch modes.
+--save-baseline stores the numbers in benchmarks/baseline.json; later runs are
+compared against it and exit non-zero when a metric regresses past --threshold
+and by more than --min-delta seconds. Timings depend on the machine, so record
+the baseline on the machine that runs the comparison.
+
+    python benchmarks/bench_e2e.py --iterations 20 --ai-latency 0.2 --ai-error-rate 0.1
+"""
+import argparse
+import contextlib
+import io
+import json
+import logging
+import math
+import os
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, HERE)
+
+from fake_services import FakeServices, FakeServiceConfig  # noqa: E402
+
+BASELINE_FILE = os.path.join(HERE, 'baseline.json')
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def summarize(samples: Dict[str, List[float]]) -> Dict[str, Dict[str, float]]:
+    return {
+        name: {
+            'n': len(values),
+            'p50': round(percentile(values, 50), 4),
+            'p95': round(percentile(values, 95), 4),
+            'p99': round(percentile(values, 99), 4),
+        }
+        for name, values in sorted(samples.items())
+    }
+
+
+def bench_run(bot, iterations: int) -> Dict[str, object]:
+    from RateLimiter import rate_limiter
+    from Telemetry import telemetry
+
+    samples: Dict[str, List[float]] = defaultdict(list)
+    failures = 0
+    for _ in range(iterations):
+        telemetry.reset()
+        rate_limiter.reset()  # Each scheduled run is a fresh process
+        start = time.perf_counter()
+        try:
+            bot.run()
+        except SystemExit:
+            failures += 1
+        samples['end_to_end'].append(time.perf_counter() - start)
+        for span in telemetry.report()['spans']:
+            samples[span['name']].append(span['wall_s'])
+    return {'stages': summarize(samples), 'failures': failures}
+
+
+def bench_scrape(concurrency: int) -> Dict[str, object]:
+    import HebrewEvents
+
+    results = {}
+    for label, mode in (('serial', None), ('concurrent', concurrency)):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            events = HebrewEvents.get_all_hebrew_months_events(mode)
+        elapsed = time.perf_counter() - start
+        results[label] = {'seconds': round(elapsed, 4), 'events': len(events),
+                          'events_per_s': round(len(events) / elapsed, 1)}
+    return results
+
+
+def bench_links(bot) -> Dict[str, object]:
+    events = bot.load_events()
+    wiki = bot.WikipediaClient()
+    start = time.perf_counter()
+    report = bot.check_archive_links(events, wiki)
+    elapsed = time.perf_counter() - start
+    return {'seconds': round(elapsed, 4), 'links': len(report), 'requests': wiki.api_requests,
+            'links_per_s': round(len(report) / elapsed, 1)}
+
+
+def bench_pregen(bot, days: int, workers: int) -> Dict[str, object]:
+    from PostQueue import PostQueue
+
+    queue = PostQueue(tempfile.mkdtemp(prefix='bench-queue-'))
+    start = time.perf_counter()
+    queued = bot.pregenerate(days, workers, queue=queue)
+    elapsed = time.perf_counter() - start
+    return {'seconds': round(elapsed, 4), 'posts': queued, 'posts_per_s': round(queued / elapsed, 2)}
+
+
+def bench_fanout(bot, destinations: int) -> Dict[str, object]:
+    import asyncio
+
+    chats = [{'chat_id': str(100000 + i)} for i in range(destinations)]
+    post = bot.format_post({'event': 'אירוע', 'subject_url': 'https://he.wikipedia.org/wiki/x'},
+                           'א', 'ניסן', 'פסקה ארוכה. ' * 500)  # Over 4096 characters: two messages
+    start = time.perf_counter()
+    report = asyncio.run(bot.publish({'he': post}, chats))
+    elapsed = time.perf_counter() - start
+    delivered = sum(r['ok'] for r in report.values())
+    return {'seconds': round(elapsed, 4), 'delivered': delivered,
+            'rate_limited': sum(r['rate_limited'] for r in report.values()),
+            'messages_per_s': round(sum(len(r['message_ids']) for r in report.values()) / elapsed, 1)}
+
+
+def flatten(results: Dict[str, object], prefix: str = '') -> Dict[str, float]:
+    """Timing metrics keyed by dotted path; lower is better for all of them"""
+    flat = {}
+    for key, value in results.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{path}."))
+        elif key in ('p50', 'p95', 'p99', 'seconds'):
+            flat[path] = value
+    return flat
+
+
+def compare(results: Dict[str, object], baseline: Dict[str, object], threshold: float,
+            min_delta: float) -> List[str]:
+    """Metrics slower than the baseline by more than `threshold` (relative) and `min_delta` seconds"""
+    current, previous = flatten(results), flatten(baseline)
+    regressions = []
+    for key, value in current.items():
+        before = previous.get(key)
+        # Fake-service jitter and scheduling noise move short stages by tens of milliseconds
+        if before and value > before * (1 + threshold) and value - before > min_delta:
+            regressions.append(f"{key}: {before:.4f}s -> {value:.4f}s (+{(value / before - 1) * 100:.0f}%)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenarios', default='run,scrape,links,pregen,fanout')
+    parser.add_argument('--iterations', type=int, default=10)
+    parser.add_argument('--wiki-latency', type=float, default=0.05)
+    parser.add_argument('--ai-latency', type=float, default=0.2)
+    parser.add_argument('--ai-token-delay', type=float, default=0.002)
+    parser.add_argument('--telegram-latency', type=float, default=0.05)
+    parser.add_argument('--jitter', type=float, default=0.02)
+    parser.add_argument('--error-rate', type=float, default=0.0, help="HTTP 500 share for every service")
+    parser.add_argument('--ai-error-rate', type=float, default=None, help="HTTP 500 share for the AI API")
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help="HTTP 429 share for every service")
+    parser.add_argument('--page-kb', type=int, default=120, help="size of generated article pages")
+    parser.add_argument('--concurrency', type=int, default=12, help="scraper concurrency")
+    parser.add_argument('--workers', type=int, default=4, help="pre-generation workers")
+    parser.add_argument('--destinations', type=int, default=100, help="chats in the fan-out scenario")
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--threshold', type=float, default=0.2, help="allowed slowdown vs. baseline")
+    parser.add_argument('--min-delta', type=float, default=0.05,
+                        help="smallest slowdown in seconds counted as a regression (at least 3x --jitter)")
+    parser.add_argument('--output', help="also write results to this JSON file")
+    args = parser.parse_args()
+
+    def config(latency, error_rate=args.error_rate, **kwargs):
+        return FakeServiceConfig(latency=latency, jitter=args.jitter, error_rate=error_rate,
+                                 rate_limit_rate=args.rate_limit_rate, **kwargs)
+
+    fakes = FakeServices(
+        wikipedia=config(args.wiki_latency, payload_kb=args.page_kb),
+        ai=config(args.ai_latency, args.ai_error_rate if args.ai_error_rate is not None else args.error_rate,
+                  token_delay=args.ai_token_delay),
+        telegram=config(args.telegram_latency),
+    )
+    os.environ.update(fakes.environment())
+    os.environ['HTTP_CACHE_DIR'] = ''  # Measure the network path, not the on-disk cache
+    os.environ['SUMMARY_CACHE_DIR'] = ''  # Every iteration pays for a completion
+    workdir = tempfile.mkdtemp(prefix='kedma-bench-')
+    for name in ('hebrew_events.json', 'hebrew_events.idx'):
+        if os.path.exists(os.path.join(ROOT, name)):
+            os.symlink(os.path.join(ROOT, name), os.path.join(workdir, name))
+    os.chdir(workdir)
+
+    import JewishHistoryBot as bot
+    logging.getLogger().setLevel(logging.CRITICAL)
+    bot.AI_RETRY_BACKOFF = 1.5  # Keep failure scenarios short; at most 1.5 * 2 ** (attempt - 1) seconds
+
+    scenarios = args.scenarios.split(',')
+    results: Dict[str, object] = {}
+    with fakes:
+        if 'run' in scenarios:
+            results['run'] = bench_run(bot, args.iterations)
+        if 'scrape' in scenarios:
+            results['scrape'] = bench_scrape(args.concurrency)
+        if 'links' in scenarios:
+            results['links'] = bench_links(bot)
+        if 'pregen' in scenarios:
+            results['pregen'] = bench_pregen(bot, 7, args.workers)
+        if 'fanout' in scenarios:
+            results['fanout'] = bench_fanout(bot, args.destinations)
+    results['requests'] = dict(fakes.requests)
+
+    if 'run' in results:
+        print(f"{'stage':28} {'n':>4} {'p50 s':>8} {'p95 s':>8} {'p99 s':>8}")
+        for name, stats in results['run']['stages'].items():
+            print(f"{name:28} {stats['n']:>4} {stats['p50']:>8.3f} {stats['p95']:>8.3f} {stats['p99']:>8.3f}")
+        print(f"failed runs: {results['run']['failures']}/{args.iterations}")
+    for name in ('scrape', 'links', 'pregen', 'fanout'):
+        if name in results:
+            print(f"{name}: {json.dumps(results[name], ensure_ascii=False)}")
+    print(f"requests served: {results['requests']}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=4)
+
+    if args.save_baseline:
+        with open(BASELINE_FILE, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=4)
+        print(f"Baseline saved to {BASELINE_FILE}")
+    elif os.path.exists(BASELINE_FILE):
+        with open(BASELINE_FILE, 'r', encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.threshold, max(args.min_delta, 3 * args.jitter))
+        if regressions:
+            print("Regressions against baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("No regressions against baseline")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""
+Micro-benchmark: full BeautifulSoup extraction vs. streaming extraction.
+
+Runs both paths over saved Wikipedia pages in benchmarks/fixtures/*.html and
+reports time and peak memory per page. Record fixtures with:
+
+    python benchmarks/bench_extraction.py --record 20
+
+and commit them, so that every checkout compares the same pages. Without
+recorded fixtures a fixed set of synthetic articles (short, long, and one with
+a long lead-in before the body) is used, so the benchmark still runs offline
+and reproducibly.
+"""
+import argparse
+import glob
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+import urllib.parse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from JewishHistoryBot import (  # noqa: E402
+    HTTPSession, HEBREW_EVENTS_FILE, STREAM_CHUNK_SIZE, extract_content, extract_content_streaming,
+)
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def record_fixtures(count: int) -> None:
+    """Save the first `count` distinct subject pages from the archive as fixtures"""
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    with open(os.path.join(ROOT, HEBREW_EVENTS_FILE), 'r', encoding='utf-8') as f:
+        events = json.load(f)
+    http = HTTPSession().session
+    urls = list(dict.fromkeys(e['subject_url'] for e in events))[:count]
+    for url in urls:
+        name = urllib.parse.quote(url.rsplit('/', 1)[-1], safe='')[:120]
+        response = http.get(url, timeout=30)
+        response.encoding = 'utf-8'
+        if response.status_code != 200:
+            print(f"skip {url}: HTTP {response.status_code}")
+            continue
+        with open(os.path.join(FIXTURES_DIR, f"{name}.html"), 'w', encoding='utf-8') as f:
+            f.write(response.text)
+        print(f"saved {url} ({len(response.text)} chars)")
+
+
+SYNTHETIC_PAGES = {
+    # name: (paragraphs, infobox rows)
+    'synthetic-short': (6, 10),
+    'synthetic-long': (400, 40),
+    'synthetic-long-infobox': (120, 2000),
+}
+
+
+def synthetic_page(paragraphs: int = 400, infobox_rows: int = 40) -> str:
+    """An article shaped like a Wikipedia page (infobox, headings, refs)"""
+    para = ('<p>הרב <b>ישראל בעל שם טוב</b> נולד בעיירה <a href="/wiki/x">אוקופ</a> '
+            'והיה מייסד תנועת החסידות, שהתפשטה במהירות בקהילות פודוליה ווולין.<sup>[1]</sup></p>')
+    body = ['<table class="infobox">' + '<tr><td>שדה</td><td>ערך</td></tr>' * infobox_rows + '</table>']
+    for i in range(paragraphs):
+        if i % 8 == 0:
+            body.append(f'<div class="mw-heading"><h2>פרק {i}<span>[edit]</span></h2></div>')
+        body.append(para)
+    return ('<html><head><style>.x{}</style></head><body><div id="content">'
+            '<div class="mw-parser-output">' + ''.join(body) + '</div></div>'
+            '<div class="footer">' + '<p>footer</p>' * 200 + '</div></body></html>')
+
+
+def load_fixtures():
+    paths = sorted(glob.glob(os.path.join(FIXTURES_DIR, '*.html')))
+    if not paths:
+        return [(name, synthetic_page(*shape)) for name, shape in SYNTHETIC_PAGES.items()]
+    pages = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            pages.append((os.path.basename(path), f.read()))
+    return pages
+
+
+def chunks(html: str):
+    for i in range(0, len(html), STREAM_CHUNK_SIZE):
+        yield html[i:i + STREAM_CHUNK_SIZE]
+
+
+def measure(fn, html: str, repeat: int):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(html)
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    result = fn(html)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, statistics.median(times), peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--record', type=int, metavar='N', help="record N fixture pages and exit")
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    if args.record:
+        record_fixtures(args.record)
+        return
+
+    paths = {
+        'full': extract_content,
+        'streaming': lambda html: extract_content_streaming(chunks(html)),
+    }
+    totals = {name: 0.0 for name in paths}
+    print(f"{'page':40} {'KB':>6} {'full ms':>9} {'stream ms':>10} {'full peak KB':>13} {'stream peak KB':>15}")
+    for name, html in load_fixtures():
+        results = {p: measure(fn, html, args.repeat) for p, fn in paths.items()}
+        (full_text, full_t, full_peak), (stream_text, stream_t, stream_peak) = results['full'], results['streaming']
+        match = '' if full_text == stream_text else '  (output differs)'
+        totals['full'] += full_t
+        totals['streaming'] += stream_t
+        print(f"{urllib.parse.unquote(name)[:40]:40} {len(html.encode()) // 1024:>6} {full_t * 1000:>9.1f} "
+              f"{stream_t * 1000:>10.1f} {full_peak // 1024:>13} {stream_peak // 1024:>15}{match}")
+    print(f"total: full {totals['full'] * 1000:.1f} ms, streaming {totals['streaming'] * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
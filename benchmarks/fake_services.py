@@ -0,0 +1,286 @@
+"""
+Local stand-ins for Wikipedia (article pages, month pages, MediaWiki API), the
+DeepSeek/OpenAI chat completions API and the Telegram Bot API.
+
+Each service has its own FakeServiceConfig with latency, error and 429 rates
+and payload sizes. Article pages come from benchmarks/fixtures/ when recorded
+(see bench_extraction.py --record) and are otherwise generated from the
+event text in hebrew_events.json.
+"""
+import json
+import os
+import random
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, Optional, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+MONTHS_PATH = '/wiki/ויקיפדיה:אירועים_בלוח_העברי/'
+
+
+class FakeServiceConfig:
+    """Behaviour of one fake service"""
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 rate_limit_rate: float = 0.0, retry_after: int = 1, payload_kb: int = 120,
+                 tokens: int = 180, token_delay: float = 0.0):
+        self.latency = latency            # Seconds before the response starts
+        self.jitter = jitter              # Extra uniform random latency (seconds)
+        self.error_rate = error_rate      # Share of requests answered with HTTP 500
+        self.rate_limit_rate = rate_limit_rate  # Share of requests answered with HTTP 429
+        self.retry_after = retry_after    # Retry-After / retry_after seconds on 429
+        self.payload_kb = payload_kb      # Size of generated article pages
+        self.tokens = tokens              # Completion length in streamed chunks
+        self.token_delay = token_delay    # Seconds between streamed chunks
+
+    def delay(self) -> None:
+        time.sleep(self.latency + random.uniform(0, self.jitter))
+
+    def failure(self) -> Optional[int]:
+        roll = random.random()
+        if roll < self.rate_limit_rate:
+            return 429
+        if roll < self.rate_limit_rate + self.error_rate:
+            return 500
+        return None
+
+
+def load_archive() -> List[Dict[str, Any]]:
+    with open(os.path.join(ROOT, 'hebrew_events.json'), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def article_page(title: str, events: List[Dict[str, Any]], size_kb: int) -> str:
+    """Recorded fixture for a title, or a generated article of about size_kb"""
+    name = urllib.parse.quote(title.replace(' ', '_'), safe='')[:120]
+    path = os.path.join(FIXTURES_DIR, f"{name}.html")
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read()
+
+    lead = ' '.join(e['event'] for e in events) or f"{title} הוא נושא בהיסטוריה היהודית."
+    para = f"<p><b>{title}</b> – {lead} הערך עוסק בתולדותיו, בפועלו ובהשפעתו על הדורות הבאים.<sup>[1]</sup></p>"
+    body = []
+    while sum(map(len, body)) < size_kb * 1024 // 2:  # Hebrew is two bytes per character
+        if len(body) % 6 == 0:
+            body.append(f'<div class="mw-heading"><h2>פרק {len(body)}</h2></div>')
+        body.append(para)
+    return ('<html><head><style>.mw{}</style></head><body><div id="content">'
+            '<table class="infobox">' + '<tr><td>שדה</td><td>ערך</td></tr>' * 30 + '</table>'
+            '<div class="mw-parser-output">' + ''.join(body) + '</div></div></body></html>')
+
+
+def month_page(month: str, events: List[Dict[str, Any]]) -> str:
+    """Month page in the layout HebrewEvents.parse_month_events expects"""
+    by_day: Dict[str, List[Dict[str, Any]]] = {}
+    for e in events:
+        if e['month'] == month:
+            by_day.setdefault(e['day'], []).append(e)
+    rows = []
+    for day, day_events in by_day.items():
+        items = ''.join(
+            f'<li>{e.get("year", "")} – <b><a href="/wiki/{urllib.parse.quote(e["subject_url"].rsplit("/wiki/", 1)[-1])}" '
+            f'title="{e["subject"]}">{e["subject"]}</a></b> {e["event"]}</li>'
+            for e in day_events
+        )
+        rows.append(
+            f'<tr><td style="text-align:center"><a href="#" title="{day} ב{month}">{day}</a></td>'
+            f'<td style="text-align:right"><ul>{items}</ul></td></tr>'
+        )
+    return '<html><body><table>' + ''.join(rows) + '</table></body></html>'
+
+
+SUMMARY_TOKENS = [
+    '**רבי ישראל** ', 'היה ', 'מגדולי ', 'הדור, ', 'ופעל ', 'בקהילות ', '**פולין**. ',
+    'תלמידיו ', 'הפיצו ', 'את ', 'תורתו ', 'לדורות.\n\n',
+]
+
+
+class _QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        pass  # Clients closing streams early is expected
+
+
+class FakeServices:
+    """All fake services behind one local ThreadingHTTPServer"""
+    def __init__(self, wikipedia: Optional[FakeServiceConfig] = None, ai: Optional[FakeServiceConfig] = None,
+                 telegram: Optional[FakeServiceConfig] = None):
+        self.configs = {
+            'wikipedia': wikipedia or FakeServiceConfig(),
+            'ai': ai or FakeServiceConfig(),
+            'telegram': telegram or FakeServiceConfig(),
+        }
+        self.requests = {name: 0 for name in self.configs}
+        self.events = load_archive()
+        self._by_title: Optional[Dict[str, List[Dict[str, Any]]]] = None
+        self._index_lock = threading.Lock()
+        self._pages: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+        self.server = _QuietServer(('127.0.0.1', 0), self._handler())
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def environment(self) -> Dict[str, str]:
+        """Environment variables that point the bot and the scraper at these fakes"""
+        return {
+            'WIKIPEDIA_BASE_URL': self.url,
+            'WIKIPEDIA_API_URL': f"{self.url}/w/api.php",
+            'DEEPSEEK_BASE_URL': self.url,
+            'OPENAI_BASE_URL': self.url,
+            'TELEGRAM_API_URL': self.url,
+            'TELEGRAM_BOT_TOKEN': 'fake-token',
+            'DEEPSEEK_API_KEY': 'fake-key',
+            'OPENAI_API_KEY': 'fake-key',
+        }
+
+    @property
+    def by_title(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Archive events by article title, resolved from subject_url exactly as the bot does"""
+        with self._index_lock:
+            if self._by_title is None:
+                # Imported on first use: JewishHistoryBot reads its endpoints from the
+                # environment at import time, which the caller sets from environment()
+                from JewishHistoryBot import title_from_url
+
+                self._by_title = {}
+                for e in self.events:
+                    self._by_title.setdefault(title_from_url(e['subject_url']), []).append(e)
+            return self._by_title
+
+    def page(self, title: str) -> bytes:
+        with self._lock:
+            if title not in self._pages:
+                size = self.configs['wikipedia'].payload_kb
+                self._pages[title] = article_page(title, self.by_title.get(title, []), size).encode('utf-8')
+            return self._pages[title]
+
+    def _handler(self):
+        services = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, body: bytes, content_type: str, headers: Optional[Dict[str, str]] = None):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _json(self, status: int, data: Any, headers: Optional[Dict[str, str]] = None):
+                self._send(status, json.dumps(data, ensure_ascii=False).encode('utf-8'), 'application/json', headers)
+
+            def _fail(self, service: str) -> bool:
+                config = services.configs[service]
+                with services._lock:
+                    services.requests[service] += 1
+                config.delay()
+                status = config.failure()
+                if status is None:
+                    return False
+                if status == 429:
+                    body = {'ok': False, 'error_code': 429, 'description': 'Too Many Requests',
+                            'parameters': {'retry_after': config.retry_after}}
+                    self._json(429, body, {'Retry-After': str(config.retry_after)})
+                else:
+                    self._json(500, {'error': 'fake server error'})
+                return True
+
+            def _body(self) -> bytes:
+                return self.rfile.read(int(self.headers.get('Content-Length') or 0))
+
+            def do_GET(self):
+                path = urllib.parse.unquote(urllib.parse.urlsplit(self.path).path)
+                if not path.startswith('/wiki/'):
+                    return self._json(404, {'error': 'not found'})
+                if self._fail('wikipedia'):
+                    return
+                if path.startswith(MONTHS_PATH):
+                    body = month_page(path[len(MONTHS_PATH):], services.events).encode('utf-8')
+                else:
+                    title = path[len('/wiki/'):].replace('_', ' ')
+                    if title not in services.by_title:
+                        return self._send(404, b'<html>missing</html>', 'text/html; charset=utf-8')
+                    body = services.page(title)
+                self._send(200, body, 'text/html; charset=utf-8')
+
+            def do_POST(self):
+                path = urllib.parse.urlsplit(self.path).path
+                body = self._body()
+                if path == '/w/api.php':
+                    if self._fail('wikipedia'):
+                        return
+                    return self._api_query(urllib.parse.parse_qs(body.decode('utf-8')))
+                if path == '/v1/chat/completions':
+                    if self._fail('ai'):
+                        return
+                    return self._completion(json.loads(body))
+                if path.endswith('/sendMessage'):
+                    if self._fail('telegram'):
+                        return
+                    payload = json.loads(body)
+                    return self._json(200, {'ok': True, 'result': {
+                        'message_id': services.requests['telegram'],
+                        'chat': {'id': payload['chat_id']},
+                        'date': int(time.time()),
+                    }})
+                self._json(404, {'error': 'not found'})
+
+            def _api_query(self, params: Dict[str, List[str]]):
+                titles = params.get('titles', [''])[0].split('|')
+                pages = []
+                for title in titles:
+                    if title in services.by_title:
+                        events = services.by_title[title]
+                        pages.append({'pageid': abs(hash(title)) % 10 ** 6, 'ns': 0, 'title': title,
+                                      'extract': ' '.join(e['event'] for e in events)})
+                    else:
+                        pages.append({'ns': 0, 'title': title, 'missing': True})
+                self._json(200, {'batchcomplete': True, 'query': {'pages': pages}})
+
+            def _completion(self, request: Dict[str, Any]):
+                config = services.configs['ai']
+                chunks = [SUMMARY_TOKENS[i % len(SUMMARY_TOKENS)] for i in range(config.tokens)]
+                usage = {'prompt_tokens': 1200, 'completion_tokens': len(chunks),
+                         'total_tokens': 1200 + len(chunks)}
+                if not request.get('stream'):
+                    time.sleep(config.token_delay * len(chunks))
+                    return self._json(200, {
+                        'choices': [{'message': {'role': 'assistant', 'content': ''.join(chunks)}}],
+                        'usage': usage,
+                    })
+
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Connection', 'close')
+                self.end_headers()
+                try:
+                    for chunk in chunks:
+                        event = {'choices': [{'delta': {'content': chunk}}]}
+                        self.wfile.write(f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode('utf-8'))
+                        self.wfile.flush()
+                        if config.token_delay:
+                            time.sleep(config.token_delay)
+                    self.wfile.write(f"data: {json.dumps({'choices': [], 'usage': usage})}\n\n".encode('utf-8'))
+                    self.wfile.write(b"data: [DONE]\n\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # Client closed the stream early
+                self.close_connection = True
+
+        return Handler